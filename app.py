@@ -1,12 +1,30 @@
 from flask import Flask, render_template, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 import os
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from config import config
+from app.websocket import json_codec
+
+def configure_logging(level=logging.INFO):
+    """Send log records through a queue so handlers never wait on stream writes; a listener thread writes them"""
+    root = logging.getLogger()
+    if root.handlers:
+        return  # already configured, as logging.basicConfig would leave it
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # writes out records still queued at shutdown
 
 def create_app(config_name=None):
     if config_name is None:
@@ -16,7 +34,7 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
 
     # Configure logging
-    logging.basicConfig(level=logging.INFO)
+    configure_logging(logging.INFO)
     # If you want to see SQLAlchemy logs, uncomment the following:
     # logging.getLogger('sqlalchemy.engine').setLevel(logging.INFO)
     
@@ -26,15 +44,17 @@ def create_app(config_name=None):
         app, 
         cors_allowed_origins="*", 
         async_mode='threading',
+        message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'],
+        json=json_codec,  # orjson encodes every packet and handles datetimes natively
         logger=True,
         engineio_logger=True,
         ping_timeout=60,  # Change from 5 to 60 seconds
-        ping_interval=25
-    )
-    limiter = Limiter(
-        key_func=get_remote_address,
-        default_limits=["200 per day", "50 per hour"]
+        ping_interval=25,
+        # Small control frames stay uncompressed; the websocket transport negotiates permessage-deflate
+        http_compression=True,
+        compression_threshold=app.config['SOCKETIO_COMPRESSION_THRESHOLD']
     )
+    from app import limiter
     limiter.init_app(app)
     
     # Create upload directory if it doesn't exist
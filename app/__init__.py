@@ -5,6 +5,14 @@ from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import os
 
+# Shared rate limiter; blueprints decorate their routes with it and the
+# app factory attaches it with init_app
+limiter = Limiter(
+    key_func=get_remote_address,
+    default_limits=["200 per day", "50 per hour"],
+    storage_uri="memory://"
+)
+
 def create_app(config_name=None):
     """Application factory pattern"""
     from config import config
@@ -18,11 +26,7 @@ def create_app(config_name=None):
     # Initialize extensions
     CORS(app)
     socketio = SocketIO(app, cors_allowed_origins="*")
-    limiter = Limiter(
-        app,
-        key_func=get_remote_address,
-        default_limits=["200 per day", "50 per hour"]
-    )
+    limiter.init_app(app)
     
     # Create upload directory if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -1,6 +1,6 @@
 import logging
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterator
 from datetime import datetime
 from app.services.ai_query_processor import AIQueryProcessor
 from app.services.natural_language_parser import NaturalLanguageParser
@@ -287,6 +287,13 @@ class AIService:
                 'error': str(e)
             }
     
+    def explain_query_results_stream(self, query_result: QueryResult, original_prompt: str,
+                                     sql_query: str, model: Optional[str] = None) -> Iterator[str]:
+        """Stream a human-readable explanation of query results as text deltas"""
+        return self.ai_processor.explain_query_results_stream(
+            query_result.data, original_prompt, sql_query, model=model
+        )
+    
     def suggest_related_queries(self, original_query: str, database_id: str) -> Dict[str, Any]:
         """Suggest related queries based on the original query and database schema"""
         try:
@@ -1,10 +1,11 @@
 import sqlite3
 import os
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Iterator
 from datetime import datetime
 from pathlib import Path
-from app.services.sqlite_manager import SQLiteManager
+from config import Config
+from app.services.sqlite_manager import SQLiteManager, quote_identifier
 from app.models.schemas import DatabaseInfo, DatabaseStatus, TableInfo, ColumnInfo
 
 class DatabaseModel:
@@ -13,8 +14,11 @@ class DatabaseModel:
     # Class-level shared registry to ensure all instances share the same data
     _shared_registry = {}
     
+    # Class-level shared manager so every blueprint reuses the same pooled connections
+    _shared_manager = SQLiteManager()
+    
     def __init__(self):
-        self.sqlite_manager = SQLiteManager()
+        self.sqlite_manager = DatabaseModel._shared_manager
         self.logger = logging.getLogger(__name__)
         # Use the shared registry instead of instance-specific one
         self._database_registry = DatabaseModel._shared_registry
@@ -188,6 +192,7 @@ class DatabaseModel:
             start_time = datetime.now()
             result = self.sqlite_manager.execute_query(query, database_id, params)
             execution_time = (datetime.now() - start_time).total_seconds()
+            self._flag_missing_table(database_id, result)
             
             # Add execution time to result
             result['execution_time'] = execution_time
@@ -198,16 +203,72 @@ class DatabaseModel:
             self.logger.error(f"Error executing query on database {database_id}: {str(e)}")
             raise
     
+    def stream_query(self, database_id: str, query: str, params: Optional[Tuple] = None,
+                     chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Execute a SELECT query on the specified database and yield its rows in chunks"""
+        try:
+            if database_id not in self._database_registry:
+                raise ValueError(f"Database {database_id} not loaded")
+            
+            # Ensure database is loaded in SQLiteManager
+            db_info = self._database_registry[database_id]['info']
+            if database_id not in self.sqlite_manager.database_paths:
+                self.logger.info(f"Reloading database {database_id} in SQLiteManager")
+                self.sqlite_manager.load_database(db_info.path)
+            
+            # Update last accessed time
+            self._database_registry[database_id]['info'].last_accessed = datetime.now()
+            
+            yield from self.sqlite_manager.stream_query(query, database_id, params, chunk_size)
+            
+        except Exception as e:
+            self.logger.error(f"Error streaming query on database {database_id}: {str(e)}")
+            raise
+    
+    def execute_many(self, database_id: str, query: str, params_seq: List[Tuple]) -> Dict[str, Any]:
+        """Execute a parameterized write query once per parameter tuple on the specified database"""
+        try:
+            if database_id not in self._database_registry:
+                raise ValueError(f"Database {database_id} not loaded")
+            
+            # Ensure database is loaded in SQLiteManager
+            db_info = self._database_registry[database_id]['info']
+            if database_id not in self.sqlite_manager.database_paths:
+                self.logger.info(f"Reloading database {database_id} in SQLiteManager")
+                self.sqlite_manager.load_database(db_info.path)
+            
+            # Update last accessed time
+            self._database_registry[database_id]['info'].last_accessed = datetime.now()
+            
+            # Execute batch
+            start_time = datetime.now()
+            result = self.sqlite_manager.execute_many(query, database_id, params_seq)
+            execution_time = (datetime.now() - start_time).total_seconds()
+            self._flag_missing_table(database_id, result)
+            
+            # Add execution time to result
+            result['execution_time'] = execution_time
+            
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Error executing batch query on database {database_id}: {str(e)}")
+            raise
+    
     def get_table_data(self, database_id: str, table_name: str, limit: int = 100, 
                       offset: int = 0, filters: Optional[Dict] = None, 
-                      sort_by: Optional[str] = None, sort_order: str = "ASC") -> Dict[str, Any]:
+                      sort_by: Optional[str] = None, sort_order: str = "ASC",
+                      table_checked: bool = False) -> Dict[str, Any]:
         """Get paginated data from a specific table with optional filtering and sorting"""
         try:
-            if database_id not in self._database_registry:
-                raise ValueError(f"Database {database_id} not loaded")
+            # Callers that already resolved the table (the table routes' before_request hook) skip the re-check
+            if not table_checked:
+                table_error = self._check_table(database_id, table_name)
+                if table_error:
+                    return table_error
             
             # Build query with filters and sorting
-            query = f"SELECT * FROM {table_name}"
+            query = f"SELECT * FROM {quote_identifier(table_name)}"
             params = []
             
             # Add filters
@@ -225,15 +286,16 @@ class DatabaseModel:
             if sort_by:
                 query += f" ORDER BY {sort_by} {sort_order}"
             
-            # Add pagination
-            query += f" LIMIT {limit} OFFSET {offset}"
+            # Add pagination as bound parameters so each page reuses the cached prepared statement
+            query += " LIMIT ? OFFSET ?"
+            params.extend((limit, offset))
             
             # Execute query
-            result = self.execute_query(database_id, query, tuple(params) if params else None)
+            result = self.execute_query(database_id, query, tuple(params))
             
             if result['success']:
                 # Get total row count for pagination info
-                count_query = f"SELECT COUNT(*) as total FROM {table_name}"
+                count_query = f"SELECT COUNT(*) as total FROM {quote_identifier(table_name)}"
                 if filters:
                     where_conditions = []
                     count_params = []
@@ -267,16 +329,20 @@ class DatabaseModel:
             self.logger.error(f"Error getting table data for {table_name} in database {database_id}: {str(e)}")
             raise
     
-    def insert_record(self, database_id: str, table_name: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    def insert_record(self, database_id: str, table_name: str, data: Dict[str, Any],
+                      table_checked: bool = False) -> Dict[str, Any]:
         """Insert a new record into the specified table"""
         try:
-            if database_id not in self._database_registry:
-                raise ValueError(f"Database {database_id} not loaded")
+            if not table_checked:
+                table_error = self._check_table(database_id, table_name)
+                if table_error:
+                    return table_error
             
             # Build INSERT query
             columns = list(data.keys())
             placeholders = ', '.join(['?' for _ in columns])
-            query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+            column_list = ', '.join(quote_identifier(column) for column in columns)
+            query = f"INSERT INTO {quote_identifier(table_name)} ({column_list}) VALUES ({placeholders})"
             
             # Execute query
             result = self.execute_query(database_id, query, tuple(data.values()))
@@ -287,12 +353,39 @@ class DatabaseModel:
             self.logger.error(f"Error inserting record into {table_name} in database {database_id}: {str(e)}")
             raise
     
+    def insert_records(self, database_id: str, table_name: str, records: List[Dict[str, Any]],
+                       table_checked: bool = False) -> Dict[str, Any]:
+        """Insert multiple records into the specified table in one transaction"""
+        try:
+            if not table_checked:
+                table_error = self._check_table(database_id, table_name)
+                if table_error:
+                    return table_error
+            
+            # Every record has the same keys (checked by the route), so the first decides the column list
+            columns = list(records[0].keys())
+            placeholders = ', '.join(['?' for _ in columns])
+            column_list = ', '.join(quote_identifier(column) for column in columns)
+            query = f"INSERT INTO {quote_identifier(table_name)} ({column_list}) VALUES ({placeholders})"
+            rows = [tuple(record[column] for column in columns) for record in records]
+            
+            # Execute batch insert
+            result = self.execute_many(database_id, query, rows)
+            
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"Error inserting records into {table_name} in database {database_id}: {str(e)}")
+            raise
+    
     def update_record(self, database_id: str, table_name: str, record_id: Any, 
-                     data: Dict[str, Any], id_column: str = "id") -> Dict[str, Any]:
+                     data: Dict[str, Any], id_column: str = "id", table_checked: bool = False) -> Dict[str, Any]:
         """Update an existing record in the specified table"""
         try:
-            if database_id not in self._database_registry:
-                raise ValueError(f"Database {database_id} not loaded")
+            if not table_checked:
+                table_error = self._check_table(database_id, table_name)
+                if table_error:
+                    return table_error
             
             # Build UPDATE query
             set_clauses = [f"{column} = ?" for column in data.keys()]
@@ -309,11 +402,13 @@ class DatabaseModel:
             raise
     
     def delete_record(self, database_id: str, table_name: str, record_id: Any, 
-                     id_column: str = "id") -> Dict[str, Any]:
+                     id_column: str = "id", table_checked: bool = False) -> Dict[str, Any]:
         """Delete a record from the specified table"""
         try:
-            if database_id not in self._database_registry:
-                raise ValueError(f"Database {database_id} not loaded")
+            if not table_checked:
+                table_error = self._check_table(database_id, table_name)
+                if table_error:
+                    return table_error
             
             # Build DELETE query
             query = f"DELETE FROM {table_name} WHERE {id_column} = ?"
@@ -355,10 +450,9 @@ class DatabaseModel:
         """Check if the file is a valid SQLite database"""
         try:
             # Check file extension
-            allowed_extensions = {'.db', '.sqlite', '.sqlite3'}
             file_ext = Path(file_path).suffix.lower()
             
-            if file_ext not in allowed_extensions:
+            if file_ext not in Config.ALLOWED_EXTENSIONS:
                 return False
             
             # Try to open and read the database
@@ -385,12 +479,54 @@ class DatabaseModel:
             return self._database_registry[database_id]['info']
         return None
     
+    def get_registered_database(self, database_id: str) -> Optional[DatabaseInfo]:
+        """Look up a database in the registry without refreshing the database list"""
+        entry = self._database_registry.get(database_id)
+        return entry['info'] if entry else None
+    
+    def _flag_missing_table(self, database_id: str, result: Dict[str, Any]):
+        """Report a "no such table" failure as TABLE_NOT_FOUND and forget a table dropped since load"""
+        error = result.get('error') or ''
+        if result['success'] or not error.startswith('no such table'):
+            return
+        
+        table_name = error.split(':', 1)[-1].strip()
+        result['error'] = f"Table not found: {table_name}"
+        result['error_code'] = 'TABLE_NOT_FOUND'
+        
+        # The registry's table list is from load time; drop the stale name so the next check asks SQLite
+        info = self._database_registry[database_id]['info']
+        if table_name in info.tables:
+            info.tables = [name for name in info.tables if name != table_name]
+    
+    def _check_table(self, database_id: str, table_name: str) -> Optional[Dict[str, Any]]:
+        """Return a structured error result if the database or table does not exist, else None"""
+        if database_id not in self._database_registry:
+            return {
+                'success': False,
+                'error': f"Database not found: {database_id}",
+                'error_code': 'DATABASE_NOT_FOUND'
+            }
+        
+        if not self.validate_table_exists(database_id, table_name):
+            return {
+                'success': False,
+                'error': f"Table not found: {table_name}",
+                'error_code': 'TABLE_NOT_FOUND'
+            }
+        
+        return None
+    
     def validate_table_exists(self, database_id: str, table_name: str) -> bool:
         """Check if a table exists in the database"""
         try:
             if database_id not in self._database_registry:
                 return False
             
+            # Tables recorded at load time need no round-trip to sqlite_master
+            if table_name in self._database_registry[database_id]['info'].tables:
+                return True
+            
             query = "SELECT name FROM sqlite_master WHERE type='table' AND name=?"
             result = self.execute_query(database_id, query, (table_name,))
             
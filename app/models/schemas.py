@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import List, Dict, Any, Optional, Union
+from typing import Annotated, List, Dict, Any, Optional
 from enum import Enum
 from datetime import datetime
 
@@ -67,22 +67,17 @@ class TableDataRequest(BaseModel):
     sort_by: Optional[str] = Field(None, description="Column to sort by")
     sort_order: Optional[str] = Field("ASC", pattern="^(ASC|DESC)$", description="Sort order")
 
-class RecordInsertRequest(BaseModel):
-    table_name: str = Field(..., description="Name of the table")
-    database_id: str = Field(..., description="Database identifier")
-    data: Dict[str, Any] = Field(..., description="Record data")
+class RecordInsertBody(BaseModel):
+    data: Dict[str, Any] = Field(..., min_length=1, description="Record data")
 
-class RecordUpdateRequest(BaseModel):
-    table_name: str = Field(..., description="Name of the table")
-    database_id: str = Field(..., description="Database identifier")
-    record_id: Union[int, str] = Field(..., description="Record identifier")
+class RecordBulkInsertBody(BaseModel):
+    data: List[Annotated[Dict[str, Any], Field(min_length=1)]] = Field(..., min_length=1, description="Records to insert")
+
+class RecordUpdateBody(BaseModel):
     data: Dict[str, Any] = Field(..., description="Updated record data")
     id_column: str = Field("id", description="Name of the ID column")
 
-class RecordDeleteRequest(BaseModel):
-    table_name: str = Field(..., description="Name of the table")
-    database_id: str = Field(..., description="Database identifier")
-    record_id: Union[int, str] = Field(..., description="Record identifier")
+class RecordDeleteParams(BaseModel):
     id_column: str = Field("id", description="Name of the ID column")
 
 class DatabaseCreateRequest(BaseModel):
@@ -1,8 +1,8 @@
-from flask import Blueprint, request, jsonify, current_app
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+import json
 import logging
 from typing import Dict, Any
+from app import limiter
 from app.models.database import DatabaseModel
 from app.models.ai_service import AIService
 from app.models.schemas import (
@@ -18,9 +18,6 @@ from app.routes.database import db_model
 ai_service = AIService(db_model)
 logger = logging.getLogger(__name__)
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
-
 @ai_bp.route('/query', methods=['POST'])
 @limiter.limit("30 per hour")
 def process_natural_language_query():
@@ -147,6 +144,62 @@ def explain_query_results():
         )
         return jsonify(error_response.dict()), 500
 
+@ai_bp.route('/explain/stream', methods=['POST'])
+@limiter.limit("50 per hour")
+def stream_query_explanation():
+    """Stream the explanation for query results as server-sent events"""
+    try:
+        request_data = request.json
+        
+        # Validate required fields
+        required_fields = ['query_result', 'original_prompt', 'sql_query']
+        for field in required_fields:
+            if field not in request_data:
+                error_response = ErrorResponse(
+                    error=f"Missing required field: {field}",
+                    error_code="MISSING_FIELD"
+                )
+                return jsonify(error_response.dict()), 400
+        
+        from app.models.schemas import QueryResult
+        query_result = QueryResult(**request_data['query_result'])
+        if not query_result.success or not query_result.data:
+            error_response = ErrorResponse(
+                error="No data to explain",
+                error_code="NO_DATA"
+            )
+            return jsonify(error_response.dict()), 400
+        
+        deltas = ai_service.explain_query_results_stream(
+            query_result,
+            request_data['original_prompt'],
+            request_data['sql_query'],
+            model=request_data.get('model')
+        )
+        
+        def generate():
+            try:
+                for delta in deltas:
+                    yield f"data: {json.dumps({'content': delta})}\n\n"
+            except Exception as e:
+                logger.error(f"Error streaming query explanation: {str(e)}")
+                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            yield "data: [DONE]\n\n"
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        logger.error(f"Error explaining query results: {str(e)}")
+        error_response = ErrorResponse(
+            error=str(e),
+            error_code="EXPLANATION_ERROR"
+        )
+        return jsonify(error_response.dict()), 500
+
 @ai_bp.route('/optimize', methods=['POST'])
 @limiter.limit("20 per hour")
 def get_optimization_suggestions():
@@ -1,12 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from werkzeug.utils import secure_filename
 import os
 import logging
 from typing import Dict, Any
+from app import limiter
 from app.models.database import DatabaseModel
 from app.models.ai_service import AIService
+from app.websocket import broadcast_database_update
 from app.models.schemas import (
     DatabaseLoadRequest, DatabaseCreateRequest, QueryRequest, APIResponse, ErrorResponse
 )
@@ -20,9 +20,6 @@ db_model = DatabaseModel()
 ai_service = AIService(db_model)
 logger = logging.getLogger(__name__)
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
-
 @database_bp.route('/', methods=['GET'])
 @limiter.limit("100 per hour")
 def list_databases():
@@ -341,6 +338,11 @@ def execute_query(database_id):
         
         # Execute query
         result = db_model.execute_query(database_id, request_data.query, request_data.params)
+        if result['success'] and 'rows_affected' in result:
+            broadcast_database_update(database_id, "query_executed", {
+                "query": request_data.query,
+                "rows_affected": result['rows_affected']
+            })
         
         response = APIResponse(
             success=True,
@@ -1,13 +1,14 @@
-from flask import Blueprint, request, jsonify, current_app
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from flask import Blueprint, request, jsonify, current_app, g
 import logging
 import os
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+from app import limiter
 from app.models.database import DatabaseModel
+from app.websocket import broadcast_database_update
 from app.models.schemas import (
-    TableDataRequest, RecordInsertRequest, RecordUpdateRequest, 
-    RecordDeleteRequest, APIResponse, ErrorResponse
+    TableDataRequest, RecordInsertBody, RecordBulkInsertBody, RecordUpdateBody, 
+    RecordDeleteParams, APIResponse, ErrorResponse
 )
 from pydantic import ValidationError
 
@@ -18,8 +19,56 @@ tables_bp = Blueprint('tables', __name__)
 db_model = DatabaseModel()
 logger = logging.getLogger(__name__)
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
+# HTTP status for structured error codes returned by the database model
+_ERROR_STATUS_CODES = {
+    'DATABASE_NOT_FOUND': 404,
+    'TABLE_NOT_FOUND': 404
+}
+
+def _parse_int(name: str, value: str) -> int:
+    """Parse an integer query parameter, rejecting malformed strings before calling int()"""
+    digits = value[1:] if value[:1] == '-' else value
+    if not digits.isdigit():
+        raise ValueError(f"Invalid integer value for '{name}': {value}")
+    return int(value)
+
+@lru_cache(maxsize=1024)
+def _parse_pagination_values(limit: Optional[str], offset: Optional[str],
+                             default_limit: int, max_limit: int) -> Tuple[int, int]:
+    """Parse raw limit/offset strings, clamping limit to [1, max_limit] and offset to >= 0"""
+    parsed_limit = default_limit if limit is None else _parse_int('limit', limit)
+    parsed_offset = 0 if offset is None else _parse_int('offset', offset)
+    return max(min(parsed_limit, max_limit), 1), max(parsed_offset, 0)
+
+def _parse_pagination(args, default_limit: int, max_limit: int) -> Tuple[int, int]:
+    """Return validated (limit, offset) from request args; raises ValueError on malformed input"""
+    return _parse_pagination_values(args.get('limit'), args.get('offset'), default_limit, max_limit)
+
+@tables_bp.before_request
+def resolve_table():
+    """Resolve the database and table named in the URL once per request"""
+    view_args = request.view_args or {}
+    database_id = view_args.get('database_id')
+    table_name = view_args.get('table_name')
+    
+    g.db_info = db_model.get_registered_database(database_id) if database_id else None
+    g.table_exists = bool(
+        g.db_info and table_name and db_model.validate_table_exists(database_id, table_name)
+    )
+
+def _table_not_found(database_id: str, table_name: str):
+    """Build the 404 response for a database or table that resolve_table could not find"""
+    if g.db_info is None:
+        error_response = ErrorResponse(
+            error=f"Database not found: {database_id}",
+            error_code="DATABASE_NOT_FOUND"
+        )
+    else:
+        error_response = ErrorResponse(
+            error=f"Table not found: {table_name}",
+            error_code="TABLE_NOT_FOUND"
+        )
+    return jsonify(error_response.dict()), 404
 
 @tables_bp.route('/<database_id>/<table_name>', methods=['GET'])
 @limiter.limit("200 per hour")
@@ -27,8 +76,7 @@ def get_table_data(database_id: str, table_name: str):
     """Get paginated data from a specific table"""
     try:
         # Get query parameters
-        limit = min(int(request.args.get('limit', 100)), 1000)  # Max 1000 rows
-        offset = max(int(request.args.get('offset', 0)), 0)
+        limit, offset = _parse_pagination(request.args, 100, 1000)  # Max 1000 rows
         sort_by = request.args.get('sort_by')
         sort_order = request.args.get('sort_order', 'ASC').upper()
         
@@ -43,21 +91,8 @@ def get_table_data(database_id: str, table_name: str):
                 column_name = key[7:]  # Remove 'filter_' prefix
                 filters[column_name] = value
         
-        # Validate database exists
-        if not db_model.get_database_info(database_id):
-            error_response = ErrorResponse(
-                error=f"Database not found: {database_id}",
-                error_code="DATABASE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
-        
-        # Validate table exists
-        if not db_model.validate_table_exists(database_id, table_name):
-            error_response = ErrorResponse(
-                error=f"Table not found: {table_name}",
-                error_code="TABLE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
+        if not g.table_exists:
+            return _table_not_found(database_id, table_name)
         
         # Get table data
         result = db_model.get_table_data(
@@ -67,7 +102,8 @@ def get_table_data(database_id: str, table_name: str):
             offset=offset,
             filters=filters if filters else None,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            table_checked=True
         )
         
         if result['success']:
@@ -87,11 +123,12 @@ def get_table_data(database_id: str, table_name: str):
             
             return jsonify(response.dict()), 200
         else:
+            error_code = result.get('error_code', "TABLE_DATA_ERROR")
             error_response = ErrorResponse(
                 error=result.get('error', 'Unknown error'),
-                error_code="TABLE_DATA_ERROR"
+                error_code=error_code
             )
-            return jsonify(error_response.dict()), 500
+            return jsonify(error_response.dict()), _ERROR_STATUS_CODES.get(error_code, 500)
         
     except ValueError as e:
         error_response = ErrorResponse(
@@ -122,45 +159,33 @@ def insert_record(database_id: str, table_name: str):
             )
             return jsonify(error_response.dict()), 400
         
-        # Create request object for validation
+        # Validate the request body; path parameters come from the URL
         try:
-            insert_request = RecordInsertRequest(
-                table_name=table_name,
-                database_id=database_id,
-                data=request_data['data']
-            )
+            insert_request = RecordInsertBody.model_validate(request_data)
         except ValidationError as e:
             error_response = ErrorResponse(
                 error="Invalid request data",
                 error_code="VALIDATION_ERROR",
-                details=e.errors()
+                details={"validation_errors": e.errors()}
             )
             return jsonify(error_response.dict()), 400
         
-        # Validate database exists
-        if not db_model.get_database_info(database_id):
-            error_response = ErrorResponse(
-                error=f"Database not found: {database_id}",
-                error_code="DATABASE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
-        
-        # Validate table exists
-        if not db_model.validate_table_exists(database_id, table_name):
-            error_response = ErrorResponse(
-                error=f"Table not found: {table_name}",
-                error_code="TABLE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
+        if not g.table_exists:
+            return _table_not_found(database_id, table_name)
         
         # Insert record
         result = db_model.insert_record(
             database_id=database_id,
             table_name=table_name,
-            data=insert_request.data
+            data=insert_request.data,
+            table_checked=True
         )
         
         if result['success']:
+            broadcast_database_update(database_id, "record_inserted", {
+                "table": table_name,
+                "rows_affected": result['rows_affected']
+            })
             response = APIResponse(
                 success=True,
                 message=f"Record inserted successfully into {table_name}",
@@ -168,11 +193,12 @@ def insert_record(database_id: str, table_name: str):
             )
             return jsonify(response.dict()), 201
         else:
+            error_code = result.get('error_code', "INSERT_ERROR")
             error_response = ErrorResponse(
                 error=result.get('error', 'Unknown error'),
-                error_code="INSERT_ERROR"
+                error_code=error_code
             )
-            return jsonify(error_response.dict()), 500
+            return jsonify(error_response.dict()), _ERROR_STATUS_CODES.get(error_code, 500)
         
     except Exception as e:
         logger.error(f"Error inserting record: {str(e)}")
@@ -182,10 +208,10 @@ def insert_record(database_id: str, table_name: str):
         )
         return jsonify(error_response.dict()), 500
 
-@tables_bp.route('/<database_id>/<table_name>/<record_id>', methods=['PUT'])
-@limiter.limit("100 per hour")
-def update_record(database_id: str, table_name: str, record_id: str):
-    """Update an existing record in the specified table"""
+@tables_bp.route('/<database_id>/<table_name>/bulk', methods=['POST'])
+@limiter.limit("20 per hour")
+def insert_records(database_id: str, table_name: str):
+    """Insert a batch of records into the specified table"""
     try:
         # Validate request data
         request_data = request.json
@@ -196,41 +222,91 @@ def update_record(database_id: str, table_name: str, record_id: str):
             )
             return jsonify(error_response.dict()), 400
         
-        # Get ID column name (default to 'id')
-        id_column = request_data.get('id_column', 'id')
-        
-        # Create request object for validation
+        # Validate the request body; path parameters come from the URL
         try:
-            update_request = RecordUpdateRequest(
-                table_name=table_name,
-                database_id=database_id,
-                record_id=record_id,
-                data=request_data['data'],
-                id_column=id_column
-            )
+            bulk_request = RecordBulkInsertBody.model_validate(request_data)
         except ValidationError as e:
             error_response = ErrorResponse(
                 error="Invalid request data",
                 error_code="VALIDATION_ERROR",
-                details=e.errors()
+                details={"validation_errors": e.errors()}
             )
             return jsonify(error_response.dict()), 400
         
-        # Validate database exists
-        if not db_model.get_database_info(database_id):
+        # All records must name the same columns, or later records would silently lose or null fields
+        columns = bulk_request.data[0].keys()
+        if any(record.keys() != columns for record in bulk_request.data[1:]):
             error_response = ErrorResponse(
-                error=f"Database not found: {database_id}",
-                error_code="DATABASE_NOT_FOUND"
+                error="All records must have the same fields",
+                error_code="INCONSISTENT_RECORDS"
             )
-            return jsonify(error_response.dict()), 404
+            return jsonify(error_response.dict()), 400
         
-        # Validate table exists
-        if not db_model.validate_table_exists(database_id, table_name):
+        if not g.table_exists:
+            return _table_not_found(database_id, table_name)
+        
+        # Insert records
+        result = db_model.insert_records(
+            database_id=database_id,
+            table_name=table_name,
+            records=bulk_request.data,
+            table_checked=True
+        )
+        
+        if result['success']:
+            broadcast_database_update(database_id, "record_inserted", {
+                "table": table_name,
+                "rows_affected": result['rows_affected']
+            })
+            response = APIResponse(
+                success=True,
+                message=f"{result['rows_affected']} records inserted successfully into {table_name}",
+                data=result
+            )
+            return jsonify(response.dict()), 201
+        else:
+            error_code = result.get('error_code', "INSERT_ERROR")
             error_response = ErrorResponse(
-                error=f"Table not found: {table_name}",
-                error_code="TABLE_NOT_FOUND"
+                error=result.get('error', 'Unknown error'),
+                error_code=error_code
             )
-            return jsonify(error_response.dict()), 404
+            return jsonify(error_response.dict()), _ERROR_STATUS_CODES.get(error_code, 500)
+        
+    except Exception as e:
+        logger.error(f"Error inserting records: {str(e)}")
+        error_response = ErrorResponse(
+            error=str(e),
+            error_code="INSERT_ERROR"
+        )
+        return jsonify(error_response.dict()), 500
+
+@tables_bp.route('/<database_id>/<table_name>/<record_id>', methods=['PUT'])
+@limiter.limit("100 per hour")
+def update_record(database_id: str, table_name: str, record_id: str):
+    """Update an existing record in the specified table"""
+    try:
+        # Validate request data
+        request_data = request.json
+        if not request_data or 'data' not in request_data:
+            error_response = ErrorResponse(
+                error="Missing record data",
+                error_code="MISSING_DATA"
+            )
+            return jsonify(error_response.dict()), 400
+        
+        # Validate the request body (id_column defaults to 'id'); path parameters come from the URL
+        try:
+            update_request = RecordUpdateBody.model_validate(request_data)
+        except ValidationError as e:
+            error_response = ErrorResponse(
+                error="Invalid request data",
+                error_code="VALIDATION_ERROR",
+                details={"validation_errors": e.errors()}
+            )
+            return jsonify(error_response.dict()), 400
+        
+        if not g.table_exists:
+            return _table_not_found(database_id, table_name)
         
         # Update record
         result = db_model.update_record(
@@ -238,7 +314,8 @@ def update_record(database_id: str, table_name: str, record_id: str):
             table_name=table_name,
             record_id=record_id,
             data=update_request.data,
-            id_column=update_request.id_column
+            id_column=update_request.id_column,
+            table_checked=True
         )
         
         if result['success']:
@@ -249,6 +326,10 @@ def update_record(database_id: str, table_name: str, record_id: str):
                 )
                 return jsonify(error_response.dict()), 404
             
+            broadcast_database_update(database_id, "record_updated", {
+                "table": table_name,
+                "record_id": record_id
+            })
             response = APIResponse(
                 success=True,
                 message=f"Record updated successfully in {table_name}",
@@ -256,11 +337,12 @@ def update_record(database_id: str, table_name: str, record_id: str):
             )
             return jsonify(response.dict()), 200
         else:
+            error_code = result.get('error_code', "UPDATE_ERROR")
             error_response = ErrorResponse(
                 error=result.get('error', 'Unknown error'),
-                error_code="UPDATE_ERROR"
+                error_code=error_code
             )
-            return jsonify(error_response.dict()), 500
+            return jsonify(error_response.dict()), _ERROR_STATUS_CODES.get(error_code, 500)
         
     except Exception as e:
         logger.error(f"Error updating record: {str(e)}")
@@ -275,47 +357,29 @@ def update_record(database_id: str, table_name: str, record_id: str):
 def delete_record(database_id: str, table_name: str, record_id: str):
     """Delete a record from the specified table"""
     try:
-        # Get ID column name from query parameters (default to 'id')
-        id_column = request.args.get('id_column', 'id')
-        
-        # Create request object for validation
+        # Validate the ID column name from query parameters (default to 'id')
         try:
-            delete_request = RecordDeleteRequest(
-                table_name=table_name,
-                database_id=database_id,
-                record_id=record_id,
-                id_column=id_column
+            delete_request = RecordDeleteParams.model_validate(
+                {'id_column': request.args.get('id_column', 'id')}
             )
         except ValidationError as e:
             error_response = ErrorResponse(
                 error="Invalid request data",
                 error_code="VALIDATION_ERROR",
-                details=e.errors()
+                details={"validation_errors": e.errors()}
             )
             return jsonify(error_response.dict()), 400
         
-        # Validate database exists
-        if not db_model.get_database_info(database_id):
-            error_response = ErrorResponse(
-                error=f"Database not found: {database_id}",
-                error_code="DATABASE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
-        
-        # Validate table exists
-        if not db_model.validate_table_exists(database_id, table_name):
-            error_response = ErrorResponse(
-                error=f"Table not found: {table_name}",
-                error_code="TABLE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
+        if not g.table_exists:
+            return _table_not_found(database_id, table_name)
         
         # Delete record
         result = db_model.delete_record(
             database_id=database_id,
             table_name=table_name,
             record_id=record_id,
-            id_column=delete_request.id_column
+            id_column=delete_request.id_column,
+            table_checked=True
         )
         
         if result['success']:
@@ -326,6 +390,10 @@ def delete_record(database_id: str, table_name: str, record_id: str):
                 )
                 return jsonify(error_response.dict()), 404
             
+            broadcast_database_update(database_id, "record_deleted", {
+                "table": table_name,
+                "record_id": record_id
+            })
             response = APIResponse(
                 success=True,
                 message=f"Record deleted successfully from {table_name}",
@@ -333,11 +401,12 @@ def delete_record(database_id: str, table_name: str, record_id: str):
             )
             return jsonify(response.dict()), 200
         else:
+            error_code = result.get('error_code', "DELETE_ERROR")
             error_response = ErrorResponse(
                 error=result.get('error', 'Unknown error'),
-                error_code="DELETE_ERROR"
+                error_code=error_code
             )
-            return jsonify(error_response.dict()), 500
+            return jsonify(error_response.dict()), _ERROR_STATUS_CODES.get(error_code, 500)
         
     except Exception as e:
         logger.error(f"Error deleting record: {str(e)}")
@@ -355,8 +424,8 @@ def get_table_schema(database_id: str, table_name: str):
         # Debug logging
         logger.info(f"Getting schema for database: {database_id}, table: {table_name}")
         
-        # Check if database exists in registry
-        db_info = db_model.get_database_info(database_id)
+        # Database resolved from the registry by resolve_table
+        db_info = g.db_info
         logger.info(f"Database info from registry: {db_info}")
         
         # If not in registry, try to load it
@@ -371,6 +440,8 @@ def get_table_schema(database_id: str, table_name: str):
                 try:
                     db_info = db_model.load_database(db_path)
                     logger.info(f"Successfully loaded database: {db_info}")
+                    g.db_info = db_info
+                    g.table_exists = db_model.validate_table_exists(database_id, table_name)
                 except Exception as load_error:
                     logger.error(f"Failed to load database: {load_error}")
                     error_response = ErrorResponse(
@@ -387,12 +458,8 @@ def get_table_schema(database_id: str, table_name: str):
                 return jsonify(error_response.dict()), 404
         
         # Validate table exists
-        if not db_model.validate_table_exists(database_id, table_name):
-            error_response = ErrorResponse(
-                error=f"Table not found: {table_name}",
-                error_code="TABLE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
+        if not g.table_exists:
+            return _table_not_found(database_id, table_name)
         
         # Get database schema
         schema = db_model.get_database_schema(database_id)
@@ -443,7 +510,7 @@ def export_table_data(database_id: str, table_name: str):
     try:
         # Get export format from query parameters
         export_format = request.args.get('format', 'json').lower()
-        limit = min(int(request.args.get('limit', 1000)), 10000)  # Max 10k rows for export
+        limit, _ = _parse_pagination(request.args, 1000, 10000)  # Max 10k rows for export
         
         # Validate format
         if export_format not in ['json', 'csv']:
@@ -453,36 +520,25 @@ def export_table_data(database_id: str, table_name: str):
             )
             return jsonify(error_response.dict()), 400
         
-        # Validate database exists
-        if not db_model.get_database_info(database_id):
-            error_response = ErrorResponse(
-                error=f"Database not found: {database_id}",
-                error_code="DATABASE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
-        
-        # Validate table exists
-        if not db_model.validate_table_exists(database_id, table_name):
-            error_response = ErrorResponse(
-                error=f"Table not found: {table_name}",
-                error_code="TABLE_NOT_FOUND"
-            )
-            return jsonify(error_response.dict()), 404
+        if not g.table_exists:
+            return _table_not_found(database_id, table_name)
         
         # Get table data
         result = db_model.get_table_data(
             database_id=database_id,
             table_name=table_name,
             limit=limit,
-            offset=0
+            offset=0,
+            table_checked=True
         )
         
         if not result['success']:
+            error_code = result.get('error_code', "EXPORT_ERROR")
             error_response = ErrorResponse(
                 error=result.get('error', 'Unknown error'),
-                error_code="EXPORT_ERROR"
+                error_code=error_code
             )
-            return jsonify(error_response.dict()), 500
+            return jsonify(error_response.dict()), _ERROR_STATUS_CODES.get(error_code, 500)
         
         export_data = {
             'table_name': table_name,
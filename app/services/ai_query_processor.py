@@ -1,77 +1,597 @@
 import requests
 import json
+import orjson
 import logging
-from typing import Dict, Any, List, Optional
+import re
+import asyncio
+import functools
+import hashlib
+import itertools
+import random
+import threading
+import time
+import aiohttp
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, List, Optional, Awaitable, TypeVar, Iterator, AsyncIterator, Callable, Union
 from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.services.llm_cache import LLMCache, SemanticCache
+from app.services.request_throttle import TokenBucket
+
+T = TypeVar('T')
+
+# Optional ```lang fence around a model response; the closing fence may be missing
+_FENCE_RE = re.compile(
+    r"^\s*```(?:(?:sqlite|sql|json)\b[ \t]*\n?|[a-zA-Z]+[ \t]*\n|[ \t]*\n?)(.*?)\s*(?:```)?\s*$",
+    re.DOTALL
+)
+
+def _strip_markdown_fence(content: str) -> str:
+    """Return the response content without a surrounding markdown code fence"""
+    match = _FENCE_RE.match(content)
+    return match.group(1).strip() if match else content.strip()
+
+# Rule-based safety verdicts that make the LLM call unnecessary
+_SAFE_SELECT_RE = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+_LIMIT_RE = re.compile(r"\bLIMIT\s+\d+", re.IGNORECASE)
+_RISKY_KEYWORD_RE = re.compile(
+    r"\b(?:DROP|DELETE|UPDATE|INSERT|REPLACE|ALTER|CREATE|TRUNCATE|ATTACH|DETACH|PRAGMA|VACUUM)\b|--|/\*",
+    re.IGNORECASE
+)
+_DROP_RE = re.compile(r"\bDROP\s+(?:TABLE|VIEW|INDEX|TRIGGER)\b", re.IGNORECASE)
+_DELETE_RE = re.compile(r"^\s*DELETE\s+FROM\b", re.IGNORECASE)
+_WHERE_RE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+# System prompts are module constants so the static prompt prefix is byte-identical across calls
+_SYSTEM_NL2SQL_TEMPLATE = """
+You are an expert SQL query generator. Convert natural language requests to SQLite queries.
+
+Database Schema:
+{schema}
+
+Rules:
+1. Generate only valid SQLite syntax
+2. Use proper table and column names from the schema
+3. Include appropriate WHERE clauses for filtering
+4. Use LIMIT for large result sets
+5. Return only the SQL query, no explanations
+6. If the request is unclear, generate the most reasonable interpretation
+
+Respond with only the SQL query.
+"""
+
+_SYSTEM_SCHEMA_GEN = """
+You are an expert database designer. Create a SQLite database schema based on the natural language description provided.
+
+Rules:
+1. Generate CREATE TABLE statements with appropriate data types
+2. Include primary keys, foreign keys, and constraints where appropriate
+3. Use proper SQLite data types (TEXT, INTEGER, REAL, BLOB)
+4. Add indexes for commonly queried columns
+5. Include sample INSERT statements for each table (2-3 records per table)
+6. Return a JSON object with the following structure:
+{
+  "tables": [
+    {
+      "name": "table_name",
+      "create_sql": "CREATE TABLE statement",
+      "sample_data": ["INSERT statements"]
+    }
+  ],
+  "indexes": ["CREATE INDEX statements"],
+  "description": "Brief description of the database structure"
+}
+
+Ensure all SQL is valid SQLite syntax.
+"""
+
+_SYSTEM_EXPLAIN = """
+You are a data analyst. Explain SQL query results in plain English.
+Provide insights about the data patterns, key findings, and answer the original question.
+Be concise but informative.
+"""
+
+_SYSTEM_OPTIMIZE_TEMPLATE = """
+You are a database optimization expert. Analyze SQL queries and suggest improvements.
+
+Database Schema:
+{schema}
+
+Provide specific optimization suggestions including:
+1. Index recommendations
+2. Query rewriting suggestions
+3. Performance considerations
+4. Best practices
+
+Be practical and specific.
+"""
+
+_SYSTEM_SAFETY = """
+You are a SQL security expert. Analyze queries for potential security risks.
+
+Check for:
+1. SQL injection patterns
+2. Dangerous operations (DROP, DELETE without WHERE, etc.)
+3. Performance risks (missing LIMIT on large tables)
+4. Data exposure risks
+
+Respond with JSON format:
+{
+  "safe": true/false,
+  "risk_level": "low"/"medium"/"high",
+  "warnings": ["list of specific warnings"],
+  "recommendations": ["list of recommendations"]
+}
+"""
+
+@dataclass(frozen=True)
+class FormattedSchema:
+    """Schema text rendered for prompts, with a hash of that text for cache keys"""
+    text: str
+    fingerprint: str
 
 class AIQueryProcessor:
     """Handles AI-powered query processing using OpenRouter API"""
     
+    # Responses at or below this temperature are treated as deterministic and cached
+    CACHEABLE_MAX_TEMPERATURE = 0.2
+    
+    # Upper bound on memoized _format_schema_for_ai outputs per processor
+    SCHEMA_CACHE_MAX_SIZE = 128
+    
+    # Longest string value from a result row that is copied into the explanation prompt
+    SAMPLE_VALUE_MAX_CHARS = 200
+    
+    # Providers that honour explicit prompt-cache breakpoints via OpenRouter
+    PROMPT_CACHE_CONTROL_PREFIXES = ('anthropic/',)
+    
+    # Class-level shared cache so every AIService instance benefits from it
+    _response_cache = LLMCache(max_size=512, ttl=3600)
+    
+    # Reuses generated SQL for near-identical prompts against the same schema and model
+    _sql_semantic_cache = SemanticCache(threshold=0.92)
+    
+    # Seconds to skip a rate-limited API key when the response has no usable Retry-After
+    DEFAULT_KEY_COOLDOWN = 30
+    
+    # Round-robin state shared by every processor so keys are rotated process-wide
+    _key_counter = itertools.count()
+    _key_cooldowns: Dict[str, float] = {}  # api key -> monotonic time it becomes usable again
+    _key_lock = threading.Lock()
+    
+    # Retry policy for the async client; the sync session retries the same statuses except 429 via urllib3
+    MAX_RETRIES = 3
+    RETRY_BACKOFF = 0.3
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    
+    # Process-wide throttle, created from config on first use
+    _request_bucket: Optional[TokenBucket] = None
+    _request_slots: Optional[threading.BoundedSemaphore] = None
+    _max_concurrency = 10
+    _throttle_lock = threading.Lock()
+    
+    # One process-wide pool for fanning out independent blocking API calls, shared by every processor
+    _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ai-query')
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.base_url = "https://openrouter.ai/api/v1"
+        self._session = self._create_session()
+        self._api_headers: Dict[str, Dict[str, str]] = {}  # api key -> request headers
+        # aiohttp sessions are bound to an event loop, so keep one per thread
+        self._aio_local = threading.local()
+        # Formatted schema text keyed by schema fingerprint
+        self._schema_cache: Dict[tuple, FormattedSchema] = {}
     
-    def _make_api_request(self, messages: List[Dict[str, str]], temperature: float = 0.1, model: Optional[str] = None) -> Dict[str, Any]:
-        """Make a request to OpenRouter API"""
-        api_key = current_app.config.get('OPENROUTER_API_KEY')
+    def _create_session(self) -> requests.Session:
+        """Create an HTTP session that keeps connections to OpenRouter alive between calls"""
+        session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            backoff_jitter=0.1,
+            # 429 goes straight to key cooldown; urllib3 would otherwise sleep out an uncapped Retry-After
+            status_forcelist=[500, 502, 503, 504],
+            respect_retry_after_header=False,
+            allowed_methods=None,  # Also retry POST requests
+            raise_on_status=False
+        )
+        session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry))
+        return session
+    
+    def _get_api_headers(self, api_key: str) -> Dict[str, str]:
+        """Return the request headers for an API key, building them once per key"""
+        headers = self._api_headers.get(api_key)
+        if headers is None:
+            headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "http://localhost:5000",
+                "X-Title": "SQLite AI Manager"
+            }
+            self._api_headers[api_key] = headers
+        return headers
+    
+    def _next_api_key(self) -> Optional[str]:
+        """Pick the next configured API key in round-robin order, skipping keys that are rate limited"""
+        keys = current_app.config.get('OPENROUTER_API_KEYS') or [current_app.config.get('OPENROUTER_API_KEY')]
+        if len(keys) == 1:
+            return keys[0]
+        
+        now = time.monotonic()
+        with self._key_lock:
+            for _ in range(len(keys)):
+                api_key = keys[next(self._key_counter) % len(keys)]
+                if self._key_cooldowns.get(api_key, 0) <= now:
+                    return api_key
+            
+            # Every key is cooling down; use the one that becomes usable first
+            return min(keys, key=lambda key: self._key_cooldowns.get(key, 0))
+    
+    def _cool_down_api_key(self, api_key: str, retry_after: Optional[str]):
+        """Skip a rate-limited API key until its Retry-After period has passed"""
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = self.DEFAULT_KEY_COOLDOWN
+        
+        with self._key_lock:
+            self._key_cooldowns[api_key] = time.monotonic() + delay
+        self.logger.warning(f"OpenRouter API key rate limited, skipping it for {delay:.0f}s")
+    
+    def _ensure_throttle(self):
+        """Create the shared rate limiter and concurrency cap from config on first use"""
+        if AIQueryProcessor._request_bucket is not None:
+            return
+        
+        with self._throttle_lock:
+            if AIQueryProcessor._request_bucket is None:
+                max_concurrency = int(current_app.config.get('OPENROUTER_MAX_CONCURRENCY', 10))
+                requests_per_minute = int(current_app.config.get('OPENROUTER_REQUESTS_PER_MINUTE', 120))
+                AIQueryProcessor._max_concurrency = max_concurrency
+                AIQueryProcessor._request_slots = threading.BoundedSemaphore(max_concurrency)
+                AIQueryProcessor._request_bucket = TokenBucket(
+                    rate=requests_per_minute / 60,
+                    capacity=max_concurrency
+                )
+    
+    @contextmanager
+    def _throttled(self):
+        """Hold an in-flight slot and a rate token for the duration of a synchronous request"""
+        self._ensure_throttle()
+        with self._request_slots:
+            self._request_bucket.acquire()
+            yield
+    
+    @asynccontextmanager
+    async def _throttled_async(self):
+        """Async variant of _throttled; the in-flight cap applies per event loop"""
+        self._ensure_throttle()
+        loop = asyncio.get_running_loop()
+        if getattr(self._aio_local, 'semaphore_loop', None) is not loop:
+            self._aio_local.semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._aio_local.semaphore_loop = loop
+        
+        async with self._aio_local.semaphore:
+            await self._request_bucket.acquire_async()
+            yield
+    
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before retry number attempt, honouring Retry-After when present"""
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return self.RETRY_BACKOFF * 2 ** attempt + random.uniform(0, 0.1)
+    
+    def _build_request(self, api_key: Optional[str], messages: List[Dict[str, str]], temperature: float,
+                       model: Optional[str], max_tokens: int = 1024,
+                       json_response: bool = False) -> Optional[Dict[str, Any]]:
+        """Build the chat completion payload, or return None when the API is not configured"""
         # Use provided model or fall back to config default
         if not model:
             model = current_app.config.get('OPENROUTER_MODEL')
         
-        self.logger.info(f"Making API request with model: {model}")
-        self.logger.info(f"API key configured: {bool(api_key)}")
-        
         if not api_key:
             self.logger.error("OpenRouter API key not configured")
-            # Return a mock response instead of raising an exception
-            return self._get_mock_response(messages)
+            return None
         
         if not model:
             self.logger.error("OpenRouter model not configured")
-            # Return a mock response instead of raising an exception
-            return self._get_mock_response(messages)
-        
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:5000",
-            "X-Title": "SQLite AI Manager"
-        }
+            return None
         
         payload = {
             "model": model,
-            "messages": messages,
+            "messages": self._apply_prompt_cache_control(messages, model),
             "temperature": temperature,
-            "max_tokens": 8192
+            "max_tokens": max_tokens
         }
+        if json_response:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+    
+    def _apply_prompt_cache_control(self, messages: List[Dict[str, Any]], model: str) -> List[Dict[str, Any]]:
+        """Mark the static system prompt as cacheable for providers that need an explicit breakpoint"""
+        if not model.startswith(self.PROMPT_CACHE_CONTROL_PREFIXES):
+            return messages
         
+        marked = []
+        for message in messages:
+            if message.get("role") == "system" and isinstance(message.get("content"), str):
+                message = {
+                    "role": "system",
+                    "content": [{
+                        "type": "text",
+                        "text": message["content"],
+                        "cache_control": {"type": "ephemeral"}
+                    }]
+                }
+            marked.append(message)
+        return marked
+    
+    def _response_cache_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Return the cache key for a deterministic request, or None if it should not be cached"""
+        if payload['temperature'] > self.CACHEABLE_MAX_TEMPERATURE:
+            return None
+        return LLMCache.make_key(
+            payload['model'], payload['messages'], payload['temperature'],
+            max_tokens=payload['max_tokens'], response_format=payload.get('response_format')
+        )
+    
+    def _make_api_request(self, messages: List[Dict[str, str]], temperature: float = 0.1, model: Optional[str] = None,
+                          max_tokens: int = 1024, json_response: bool = False) -> Dict[str, Any]:
+        """Make a request to OpenRouter API"""
+        api_key = self._next_api_key()
+        payload = self._build_request(api_key, messages, temperature, model, max_tokens, json_response)
+        if payload is None:
+            # Return a mock response instead of raising an exception
+            return self._get_mock_response(messages)
+        
+        cache_key = self._response_cache_key(payload)
+        if cache_key:
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info("Using cached API response")
+                return cached
+        
+        response = None
         try:
-            self.logger.info(f"Sending request to: {self.base_url}/chat/completions")
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            self.logger.info(f"API response status: {response.status_code}")
+            self.logger.debug("Sending request to %s/chat/completions", self.base_url)
+            with self._throttled():
+                response = self._session.post(
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    headers=self._get_api_headers(api_key),
+                    timeout=30
+                )
+            self.logger.info("OpenRouter %s -> %s", payload['model'], response.status_code)
             
             if response.status_code != 200:
                 self.logger.error(f"API response error: {response.text}")
+                if response.status_code == 429:
+                    self._cool_down_api_key(api_key, response.headers.get('Retry-After'))
                 # Return a mock response instead of raising an exception
                 return self._get_mock_response(messages)
             
-            return response.json()
+            result = orjson.loads(response.content)
+            if cache_key:
+                self._response_cache.set(cache_key, result)
+            return result
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            # Only transport failures and undecodable bodies fall back; other errors are bugs and propagate
+            self.logger.error(
+                "API request failed: %s (status: %s, body: %.500s)",
+                e, getattr(response, 'status_code', 'N/A'), getattr(response, 'text', 'N/A')
+            )
+            # Return a mock response instead of raising an exception
+            return self._get_mock_response(messages)
+    
+    def _mock_response_text(self, messages: List[Dict[str, str]]) -> str:
+        """Content of the mock response, for the streaming API"""
+        return self._get_mock_response(messages)['choices'][0]['message']['content']
+    
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        """Return the content delta carried by one SSE line, '' for non-content lines, or None at end of stream"""
+        if not line.startswith('data: '):
+            # Blank separators and ': OPENROUTER PROCESSING' keep-alive comments
+            return ''
+        
+        data = line[6:].strip()
+        if data == '[DONE]':
+            return None
+        
+        chunk = orjson.loads(data)
+        if 'error' in chunk:
+            raise RuntimeError(chunk['error'].get('message', 'Stream error'))
+        
+        choices = chunk.get('choices') or [{}]
+        return choices[0].get('delta', {}).get('content') or ''
+    
+    def _stream_api_request(self, messages: List[Dict[str, str]], temperature: float = 0.1,
+                            model: Optional[str] = None, max_tokens: int = 1024) -> Iterator[str]:
+        """Make a streaming request to OpenRouter API and yield content deltas as they arrive"""
+        api_key = self._next_api_key()
+        payload = self._build_request(api_key, messages, temperature, model, max_tokens)
+        if payload is None:
+            yield self._mock_response_text(messages)
+            return
+        
+        payload['stream'] = True
+        streamed = False
+        try:
+            self.logger.debug("Sending streaming request to %s/chat/completions", self.base_url)
+            # The throttle slot covers opening the request and receiving headers, not the whole stream
+            with self._throttled():
+                response = self._session.post(
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    headers=self._get_api_headers(api_key),
+                    stream=True,
+                    timeout=30
+                )
+            with response:
+                self.logger.info("OpenRouter %s -> %s", payload['model'], response.status_code)
+                
+                if response.status_code != 200:
+                    self.logger.error(f"API response error: {response.text}")
+                    if response.status_code == 429:
+                        self._cool_down_api_key(api_key, response.headers.get('Retry-After'))
+                    yield self._mock_response_text(messages)
+                    return
+                
+                for raw_line in response.iter_lines():
+                    delta = self._parse_stream_line(raw_line.decode('utf-8'))
+                    if delta is None:
+                        break
+                    if delta:
+                        streamed = True
+                        yield delta
         except Exception as e:
-            self.logger.error(f"API request failed: {str(e)}")
-            self.logger.error(f"Response status code: {getattr(response, 'status_code', 'N/A')}")
-            self.logger.error(f"Response text: {getattr(response, 'text', 'N/A')}")
+            self.logger.error(f"Streaming API request failed: {str(e)}")
+            # Fall back to the mock text only if nothing has reached the caller yet
+            if not streamed:
+                yield self._mock_response_text(messages)
+    
+    def _get_aio_session(self) -> aiohttp.ClientSession:
+        """Return this thread's aiohttp session, creating it for the running event loop on first use"""
+        loop = asyncio.get_running_loop()
+        session = getattr(self._aio_local, 'session', None)
+        if session is None or session.closed or self._aio_local.loop is not loop:
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=20))
+            self._aio_local.session = session
+            self._aio_local.loop = loop
+        return session
+    
+    async def _make_api_request_async(self, messages: List[Dict[str, str]], temperature: float = 0.1,
+                                      model: Optional[str] = None, max_tokens: int = 1024,
+                                      json_response: bool = False) -> Dict[str, Any]:
+        """Make a request to OpenRouter API without blocking the event loop"""
+        api_key = self._next_api_key()
+        payload = self._build_request(api_key, messages, temperature, model, max_tokens, json_response)
+        if payload is None:
+            # Return a mock response instead of raising an exception
+            return self._get_mock_response(messages)
+        
+        cache_key = self._response_cache_key(payload)
+        if cache_key:
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                self.logger.info("Using cached API response")
+                return cached
+        
+        try:
+            async with self._throttled_async():
+                for attempt in range(self.MAX_RETRIES + 1):
+                    self.logger.debug("Sending async request to %s/chat/completions", self.base_url)
+                    async with self._get_aio_session().post(
+                        f"{self.base_url}/chat/completions",
+                        json=payload,
+                        headers=self._get_api_headers(api_key),
+                        timeout=aiohttp.ClientTimeout(total=30)
+                    ) as response:
+                        self.logger.info("OpenRouter %s -> %s", payload['model'], response.status)
+                        
+                        if response.status in self.RETRY_STATUSES and attempt < self.MAX_RETRIES:
+                            retry_after = response.headers.get('Retry-After')
+                            if response.status == 429:
+                                self._cool_down_api_key(api_key, retry_after)
+                                next_key = self._next_api_key()
+                                # Retry-After only applies if we are stuck with the same key
+                                if next_key != api_key:
+                                    api_key, retry_after = next_key, None
+                            await asyncio.sleep(self._retry_delay(attempt, retry_after))
+                            continue
+                        
+                        if response.status != 200:
+                            self.logger.error(f"API response error: {await response.text()}")
+                            if response.status == 429:
+                                self._cool_down_api_key(api_key, response.headers.get('Retry-After'))
+                            # Return a mock response instead of raising an exception
+                            return self._get_mock_response(messages)
+                        
+                        result = orjson.loads(await response.read())
+                        if cache_key:
+                            self._response_cache.set(cache_key, result)
+                        return result
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
+            # Only transport failures and undecodable bodies fall back; other errors are bugs and propagate
+            self.logger.error("Async API request failed: %s", e)
             # Return a mock response instead of raising an exception
             return self._get_mock_response(messages)
     
+    async def _stream_api_request_async(self, messages: List[Dict[str, str]], temperature: float = 0.1,
+                                        model: Optional[str] = None, max_tokens: int = 1024) -> AsyncIterator[str]:
+        """Async variant of _stream_api_request"""
+        api_key = self._next_api_key()
+        payload = self._build_request(api_key, messages, temperature, model, max_tokens)
+        if payload is None:
+            yield self._mock_response_text(messages)
+            return
+        
+        payload['stream'] = True
+        streamed = False
+        try:
+            self.logger.debug("Sending async streaming request to %s/chat/completions", self.base_url)
+            # The throttle slot covers opening the request and receiving headers, not the whole stream
+            async with self._throttled_async():
+                response = await self._get_aio_session().post(
+                    f"{self.base_url}/chat/completions",
+                    json=payload,
+                    headers=self._get_api_headers(api_key),
+                    timeout=aiohttp.ClientTimeout(total=30)
+                )
+            async with response:
+                self.logger.info("OpenRouter %s -> %s", payload['model'], response.status)
+                
+                if response.status != 200:
+                    self.logger.error(f"API response error: {await response.text()}")
+                    if response.status == 429:
+                        self._cool_down_api_key(api_key, response.headers.get('Retry-After'))
+                    yield self._mock_response_text(messages)
+                    return
+                
+                async for raw_line in response.content:
+                    delta = self._parse_stream_line(raw_line.decode('utf-8'))
+                    if delta is None:
+                        break
+                    if delta:
+                        streamed = True
+                        yield delta
+        except Exception as e:
+            self.logger.error(f"Async streaming API request failed: {str(e)}")
+            # Fall back to the mock text only if nothing has reached the caller yet
+            if not streamed:
+                yield self._mock_response_text(messages)
+    
+    async def aclose(self):
+        """Close this thread's aiohttp session; call from the event loop that used the async API"""
+        session = getattr(self._aio_local, 'session', None)
+        if session is not None and not session.closed:
+            await session.close()
+        self._aio_local.session = None
+    
+    def run_sync(self, awaitable: Awaitable[T]) -> T:
+        """Run one of the async methods to completion from synchronous code such as a Flask route"""
+        async def runner():
+            try:
+                return await awaitable
+            finally:
+                await self.aclose()
+        
+        return asyncio.run(runner())
+    
     def _get_mock_response(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
         """Generate a mock response when API calls fail"""
         self.logger.warning("Using mock response due to API failure")
-        
+        response = self._build_mock_response(messages)
+        # Flag mock responses so they never populate the semantic cache
+        response['mock'] = True
+        return response
+    
+    def _build_mock_response(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Build the canned response for the request type"""
         # Extract the user message to determine response type
         user_message = ""
         for message in messages:
@@ -152,53 +672,72 @@ class AIQueryProcessor:
                 }]
             }
     
-    def natural_language_to_sql(self, prompt: str, schema: Dict[str, Any], model: Optional[str] = None) -> Dict[str, Any]:
+    def _sql_cache_partition(self, schema: FormattedSchema, model: Optional[str]) -> str:
+        """Partition key for the semantic SQL cache: one bucket per schema and model"""
+        return f"{model or ''}:{schema.fingerprint}"
+    
+    def _natural_language_to_sql_messages(self, prompt: str, schema_text: str) -> List[Dict[str, str]]:
+        """Build the chat messages for natural language to SQL conversion"""
+        return [
+            {"role": "system", "content": _SYSTEM_NL2SQL_TEMPLATE.format(schema=schema_text)},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _natural_language_to_sql_result(self, response: Dict[str, Any], prompt: str, partition: str) -> Dict[str, Any]:
+        """Extract the SQL query from a natural language to SQL response"""
+        # Clean up the response (remove markdown formatting if present)
+        sql_query = _strip_markdown_fence(response['choices'][0]['message']['content'])
+        
+        if sql_query and not response.get('mock'):
+            self._sql_semantic_cache.set(partition, prompt, sql_query)
+        
+        return {
+            'success': True,
+            'sql_query': sql_query,
+            'original_prompt': prompt
+        }
+    
+    def natural_language_to_sql(self, prompt: str, schema: Union[Dict[str, Any], FormattedSchema], model: Optional[str] = None) -> Dict[str, Any]:
         """Convert natural language to SQL query"""
         try:
-            # Prepare schema information
-            schema_text = self._format_schema_for_ai(schema)
-            
-            system_message = f"""
-You are an expert SQL query generator. Convert natural language requests to SQLite queries.
-
-Database Schema:
-{schema_text}
-
-Rules:
-1. Generate only valid SQLite syntax
-2. Use proper table and column names from the schema
-3. Include appropriate WHERE clauses for filtering
-4. Use LIMIT for large result sets
-5. Return only the SQL query, no explanations
-6. If the request is unclear, generate the most reasonable interpretation
-
-Respond with only the SQL query.
-"""
-            
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ]
-            
-            response = self._make_api_request(messages, model=model)
-            sql_query = response['choices'][0]['message']['content'].strip()
+            formatted_schema = self.prepare_schema(schema)
+            partition = self._sql_cache_partition(formatted_schema, model)
+            cached_sql = self._sql_semantic_cache.get(partition, prompt)
+            if cached_sql is not None:
+                return {
+                    'success': True,
+                    'sql_query': cached_sql,
+                    'original_prompt': prompt
+                }
             
-            # Clean up the response (remove markdown formatting if present)
-            if sql_query.startswith('```'):
-                # Remove opening markdown block
-                lines = sql_query.split('\n')
-                if lines[0].startswith('```'):
-                    lines = lines[1:]  # Remove first line with ```
-                # Remove closing markdown block
-                if lines and lines[-1].strip() == '```':
-                    lines = lines[:-1]  # Remove last line with ```
-                sql_query = '\n'.join(lines).strip()
+            messages = self._natural_language_to_sql_messages(prompt, formatted_schema.text)
+            response = self._make_api_request(messages, model=model, max_tokens=512)
+            return self._natural_language_to_sql_result(response, prompt, partition)
             
+        except Exception as e:
+            self.logger.error(f"Error converting natural language to SQL: {str(e)}")
             return {
-                'success': True,
-                'sql_query': sql_query,
+                'success': False,
+                'error': str(e),
                 'original_prompt': prompt
             }
+    
+    async def natural_language_to_sql_async(self, prompt: str, schema: Union[Dict[str, Any], FormattedSchema], model: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of natural_language_to_sql"""
+        try:
+            formatted_schema = self.prepare_schema(schema)
+            partition = self._sql_cache_partition(formatted_schema, model)
+            cached_sql = self._sql_semantic_cache.get(partition, prompt)
+            if cached_sql is not None:
+                return {
+                    'success': True,
+                    'sql_query': cached_sql,
+                    'original_prompt': prompt
+                }
+            
+            messages = self._natural_language_to_sql_messages(prompt, formatted_schema.text)
+            response = await self._make_api_request_async(messages, model=model, max_tokens=512)
+            return self._natural_language_to_sql_result(response, prompt, partition)
             
         except Exception as e:
             self.logger.error(f"Error converting natural language to SQL: {str(e)}")
@@ -208,59 +747,31 @@ Respond with only the SQL query.
                 'original_prompt': prompt
             }
     
-    def generate_database_schema(self, description: str) -> Dict[str, Any]:
-        """Generate database schema from natural language description"""
+    def _generate_database_schema_messages(self, description: str) -> List[Dict[str, str]]:
+        """Build the chat messages for database schema generation"""
+        return [
+            {"role": "system", "content": _SYSTEM_SCHEMA_GEN},
+            {"role": "user", "content": f"Create a database schema for: {description}"}
+        ]
+    
+    def _generate_database_schema_result(self, response: Dict[str, Any], description: str) -> Dict[str, Any]:
+        """Parse the generated schema JSON out of a schema generation response"""
+        content = response['choices'][0]['message']['content']
+        
+        # Log the raw content for debugging
+        self.logger.debug("Raw AI response content: %.500s...", content)
+        
+        # Parse JSON response; json_object mode normally returns bare JSON
         try:
-            system_message = """
-You are an expert database designer. Create a SQLite database schema based on the natural language description provided.
-
-Rules:
-1. Generate CREATE TABLE statements with appropriate data types
-2. Include primary keys, foreign keys, and constraints where appropriate
-3. Use proper SQLite data types (TEXT, INTEGER, REAL, BLOB)
-4. Add indexes for commonly queried columns
-5. Include sample INSERT statements for each table (2-3 records per table)
-6. Return a JSON object with the following structure:
-{
-  "tables": [
-    {
-      "name": "table_name",
-      "create_sql": "CREATE TABLE statement",
-      "sample_data": ["INSERT statements"]
-    }
-  ],
-  "indexes": ["CREATE INDEX statements"],
-  "description": "Brief description of the database structure"
-}
-
-Ensure all SQL is valid SQLite syntax.
-"""
-            
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": f"Create a database schema for: {description}"}
-            ]
-            
-            response = self._make_api_request(messages, temperature=0.3)
-            content = response['choices'][0]['message']['content'].strip()
-            
-            # Log the raw content for debugging
-            self.logger.info(f"Raw AI response content: {content[:500]}...")
-            
+            schema_data = orjson.loads(content)
+        except orjson.JSONDecodeError:
             # Clean up the response (remove markdown formatting if present)
-            if content.startswith('```json'):
-                content = content.replace('```json', '').replace('```', '').strip()
-            elif content.startswith('```'):
-                content = content.replace('```', '').strip()
-            
-            # Log cleaned content
-            self.logger.info(f"Cleaned content: {content[:500]}...")
+            content = _strip_markdown_fence(content)
+            self.logger.debug("Cleaned content: %.500s...", content)
             
-            # Parse JSON response
-            import json
             try:
-                schema_data = json.loads(content)
-            except json.JSONDecodeError as json_error:
+                schema_data = orjson.loads(content)
+            except orjson.JSONDecodeError as json_error:
                 self.logger.error(f"JSON parsing failed: {str(json_error)}")
                 self.logger.error(f"Content that failed to parse: {content}")
                 
@@ -271,12 +782,35 @@ Ensure all SQL is valid SQLite syntax.
                     'error': f"Failed to parse AI response: {str(json_error)}",
                     'description': description
                 }
+        
+        return {
+            'success': True,
+            'schema': schema_data,
+            'description': description
+        }
+    
+    def generate_database_schema(self, description: str) -> Dict[str, Any]:
+        """Generate database schema from natural language description"""
+        try:
+            messages = self._generate_database_schema_messages(description)
+            response = self._make_api_request(messages, temperature=0.3, max_tokens=4096, json_response=True)
+            return self._generate_database_schema_result(response, description)
             
+        except Exception as e:
+            self.logger.error(f"Error generating database schema: {str(e)}")
             return {
-                'success': True,
-                'schema': schema_data,
+                'success': False,
+                'error': str(e),
                 'description': description
             }
+    
+    async def generate_database_schema_async(self, description: str) -> Dict[str, Any]:
+        """Async variant of generate_database_schema"""
+        try:
+            messages = self._generate_database_schema_messages(description)
+            response = await self._make_api_request_async(messages, temperature=0.3, max_tokens=4096,
+                                                          json_response=True)
+            return self._generate_database_schema_result(response, description)
             
         except Exception as e:
             self.logger.error(f"Error generating database schema: {str(e)}")
@@ -286,43 +820,65 @@ Ensure all SQL is valid SQLite syntax.
                 'description': description
             }
     
-    def explain_query_results(self, results: List[Dict], original_prompt: str, sql_query: str, model: Optional[str] = None) -> Dict[str, Any]:
-        """Generate human-readable explanation of query results"""
-        try:
-            results_summary = f"Found {len(results)} results"
-            if results:
-                sample_data = json.dumps(results[:3], indent=2) if len(results) > 3 else json.dumps(results, indent=2)
-            else:
-                sample_data = "No results found"
-            
-            system_message = """
-You are a data analyst. Explain SQL query results in plain English.
-Provide insights about the data patterns, key findings, and answer the original question.
-Be concise but informative.
-"""
-            
-            user_message = f"""
+    def _truncate_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Bound the size of one sample row so large TEXT or BLOB values cannot blow up the prompt"""
+        truncated = {}
+        for column, value in row.items():
+            if isinstance(value, str) and len(value) > self.SAMPLE_VALUE_MAX_CHARS:
+                value = value[:self.SAMPLE_VALUE_MAX_CHARS] + "..."
+            elif isinstance(value, (bytes, bytearray, memoryview)):
+                value = f"<{len(value)} bytes>"
+            truncated[column] = value
+        return truncated
+    
+    def _explain_query_results_messages(self, results: List[Dict], original_prompt: str, sql_query: str) -> List[Dict[str, str]]:
+        """Build the chat messages for explaining query results"""
+        results_summary = f"Found {len(results)} results"
+        sample = [self._truncate_row(row) for row in results[:3]]
+        sample_data = orjson.dumps(sample, option=orjson.OPT_INDENT_2).decode() if sample else "No results found"
+        
+        user_message = f"""
 Original Question: {original_prompt}
 SQL Query: {sql_query}
 Results Summary: {results_summary}
 Sample Data: {sample_data}
-
-Please explain what these results mean and answer the original question.
 """
+        
+        return [
+            {"role": "system", "content": _SYSTEM_EXPLAIN},
+            {"role": "user", "content": user_message}
+        ]
+    
+    def _explain_query_results_result(self, response: Dict[str, Any], results: List[Dict]) -> Dict[str, Any]:
+        """Extract the explanation text from an explanation response"""
+        explanation = response['choices'][0]['message']['content'].strip()
+        
+        return {
+            'success': True,
+            'explanation': explanation,
+            'result_count': len(results)
+        }
+    
+    def explain_query_results(self, results: List[Dict], original_prompt: str, sql_query: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Generate human-readable explanation of query results"""
+        try:
+            messages = self._explain_query_results_messages(results, original_prompt, sql_query)
+            response = self._make_api_request(messages, temperature=0.3, model=model, max_tokens=1024)
+            return self._explain_query_results_result(response, results)
             
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ]
-            
-            response = self._make_api_request(messages, temperature=0.3)
-            explanation = response['choices'][0]['message']['content'].strip()
-            
+        except Exception as e:
+            self.logger.error(f"Error explaining query results: {str(e)}")
             return {
-                'success': True,
-                'explanation': explanation,
-                'result_count': len(results)
+                'success': False,
+                'error': str(e)
             }
+    
+    async def explain_query_results_async(self, results: List[Dict], original_prompt: str, sql_query: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of explain_query_results"""
+        try:
+            messages = self._explain_query_results_messages(results, original_prompt, sql_query)
+            response = await self._make_api_request_async(messages, temperature=0.3, model=model, max_tokens=1024)
+            return self._explain_query_results_result(response, results)
             
         except Exception as e:
             self.logger.error(f"Error explaining query results: {str(e)}")
@@ -331,41 +887,60 @@ Please explain what these results mean and answer the original question.
                 'error': str(e)
             }
     
-    def suggest_optimizations(self, query: str, schema: Dict[str, Any], model: Optional[str] = None) -> Dict[str, Any]:
+    def explain_query_results_stream(self, results: List[Dict], original_prompt: str, sql_query: str,
+                                     model: Optional[str] = None) -> Iterator[str]:
+        """Stream the explanation of query results as text deltas"""
+        messages = self._explain_query_results_messages(results, original_prompt, sql_query)
+        yield from self._stream_api_request(messages, temperature=0.3, model=model, max_tokens=1024)
+    
+    async def explain_query_results_stream_async(self, results: List[Dict], original_prompt: str, sql_query: str,
+                                                 model: Optional[str] = None) -> AsyncIterator[str]:
+        """Async variant of explain_query_results_stream"""
+        messages = self._explain_query_results_messages(results, original_prompt, sql_query)
+        async for delta in self._stream_api_request_async(messages, temperature=0.3, model=model, max_tokens=1024):
+            yield delta
+    
+    def _suggest_optimizations_messages(self, query: str, schema: Union[Dict[str, Any], FormattedSchema]) -> List[Dict[str, str]]:
+        """Build the chat messages for query optimization suggestions"""
+        schema_text = self._format_schema_for_ai(schema)
+        
+        user_message = f"Analyze this SQL query for optimization opportunities:\n\n{query}"
+        
+        return [
+            {"role": "system", "content": _SYSTEM_OPTIMIZE_TEMPLATE.format(schema=schema_text)},
+            {"role": "user", "content": user_message}
+        ]
+    
+    def _suggest_optimizations_result(self, response: Dict[str, Any], query: str) -> Dict[str, Any]:
+        """Extract the suggestions text from an optimization response"""
+        suggestions = response['choices'][0]['message']['content'].strip()
+        
+        return {
+            'success': True,
+            'suggestions': suggestions,
+            'original_query': query
+        }
+    
+    def suggest_optimizations(self, query: str, schema: Union[Dict[str, Any], FormattedSchema], model: Optional[str] = None) -> Dict[str, Any]:
         """Suggest query optimizations"""
         try:
-            schema_text = self._format_schema_for_ai(schema)
-            
-            system_message = f"""
-You are a database optimization expert. Analyze SQL queries and suggest improvements.
-
-Database Schema:
-{schema_text}
-
-Provide specific optimization suggestions including:
-1. Index recommendations
-2. Query rewriting suggestions
-3. Performance considerations
-4. Best practices
-
-Be practical and specific.
-"""
-            
-            user_message = f"Analyze this SQL query for optimization opportunities:\n\n{query}"
-            
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ]
-            
-            response = self._make_api_request(messages, temperature=0.2, model=model)
-            suggestions = response['choices'][0]['message']['content'].strip()
+            messages = self._suggest_optimizations_messages(query, schema)
+            response = self._make_api_request(messages, temperature=0.2, model=model, max_tokens=2048)
+            return self._suggest_optimizations_result(response, query)
             
+        except Exception as e:
+            self.logger.error(f"Error generating optimization suggestions: {str(e)}")
             return {
-                'success': True,
-                'suggestions': suggestions,
-                'original_query': query
+                'success': False,
+                'error': str(e)
             }
+    
+    async def suggest_optimizations_async(self, query: str, schema: Union[Dict[str, Any], FormattedSchema], model: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of suggest_optimizations"""
+        try:
+            messages = self._suggest_optimizations_messages(query, schema)
+            response = await self._make_api_request_async(messages, temperature=0.2, model=model, max_tokens=2048)
+            return self._suggest_optimizations_result(response, query)
             
         except Exception as e:
             self.logger.error(f"Error generating optimization suggestions: {str(e)}")
@@ -374,51 +949,102 @@ Be practical and specific.
                 'error': str(e)
             }
     
+    def _validate_query_safety_messages(self, sql_query: str) -> List[Dict[str, str]]:
+        """Build the chat messages for query safety validation"""
+        return [
+            {"role": "system", "content": _SYSTEM_SAFETY},
+            {"role": "user", "content": f"Analyze this SQL query: {sql_query}"}
+        ]
+    
+    def _validate_query_safety_result(self, response: Dict[str, Any], sql_query: str) -> Dict[str, Any]:
+        """Parse the safety analysis JSON out of a validation response"""
+        result_text = response['choices'][0]['message']['content'].strip()
+        
+        # Try to parse JSON response
+        try:
+            result = orjson.loads(result_text)
+        except orjson.JSONDecodeError:
+            # Fallback if AI doesn't return valid JSON
+            result = {
+                "safe": "DROP" not in sql_query.upper() and "DELETE" not in sql_query.upper(),
+                "risk_level": "medium",
+                "warnings": ["Could not parse AI safety analysis"],
+                "recommendations": ["Manual review recommended"]
+            }
+        
+        return {
+            'success': True,
+            'analysis': result
+        }
+    
+    def _quick_safety_verdict(self, sql_query: str) -> Optional[Dict[str, Any]]:
+        """Return a safety analysis for clear-cut queries, or None when the LLM needs to decide"""
+        if _DROP_RE.search(sql_query):
+            return {
+                'success': True,
+                'analysis': {
+                    "safe": False,
+                    "risk_level": "high",
+                    "warnings": ["Query drops a database object"],
+                    "recommendations": ["Back up the database before dropping objects"]
+                }
+            }
+        
+        if _DELETE_RE.match(sql_query) and not _WHERE_RE.search(sql_query):
+            return {
+                'success': True,
+                'analysis': {
+                    "safe": False,
+                    "risk_level": "high",
+                    "warnings": ["DELETE without WHERE removes every row in the table"],
+                    "recommendations": ["Add a WHERE clause to limit the rows deleted"]
+                }
+            }
+        
+        if (_SAFE_SELECT_RE.match(sql_query) and _LIMIT_RE.search(sql_query)
+                and not _RISKY_KEYWORD_RE.search(sql_query)):
+            return {
+                'success': True,
+                'analysis': {
+                    "safe": True,
+                    "risk_level": "low",
+                    "warnings": [],
+                    "recommendations": []
+                }
+            }
+        
+        return None
+    
     def validate_query_safety(self, sql_query: str, model: Optional[str] = None) -> Dict[str, Any]:
         """AI-powered query safety validation"""
         try:
-            system_message = """
-You are a SQL security expert. Analyze queries for potential security risks.
-
-Check for:
-1. SQL injection patterns
-2. Dangerous operations (DROP, DELETE without WHERE, etc.)
-3. Performance risks (missing LIMIT on large tables)
-4. Data exposure risks
-
-Respond with JSON format:
-{
-  "safe": true/false,
-  "risk_level": "low"/"medium"/"high",
-  "warnings": ["list of specific warnings"],
-  "recommendations": ["list of recommendations"]
-}
-"""
+            quick_verdict = self._quick_safety_verdict(sql_query)
+            if quick_verdict is not None:
+                return quick_verdict
             
-            messages = [
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": f"Analyze this SQL query: {sql_query}"}
-            ]
-            
-            response = self._make_api_request(messages, temperature=0.1, model=model)
-            result_text = response['choices'][0]['message']['content'].strip()
-            
-            # Try to parse JSON response
-            try:
-                result = json.loads(result_text)
-            except json.JSONDecodeError:
-                # Fallback if AI doesn't return valid JSON
-                result = {
-                    "safe": "DROP" not in sql_query.upper() and "DELETE" not in sql_query.upper(),
-                    "risk_level": "medium",
-                    "warnings": ["Could not parse AI safety analysis"],
-                    "recommendations": ["Manual review recommended"]
-                }
+            messages = self._validate_query_safety_messages(sql_query)
+            response = self._make_api_request(messages, temperature=0.1, model=model,
+                                             max_tokens=512, json_response=True)
+            return self._validate_query_safety_result(response, sql_query)
             
+        except Exception as e:
+            self.logger.error(f"Error validating query safety: {str(e)}")
             return {
-                'success': True,
-                'analysis': result
+                'success': False,
+                'error': str(e)
             }
+    
+    async def validate_query_safety_async(self, sql_query: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Async variant of validate_query_safety"""
+        try:
+            quick_verdict = self._quick_safety_verdict(sql_query)
+            if quick_verdict is not None:
+                return quick_verdict
+            
+            messages = self._validate_query_safety_messages(sql_query)
+            response = await self._make_api_request_async(messages, temperature=0.1, model=model,
+                                                         max_tokens=512, json_response=True)
+            return self._validate_query_safety_result(response, sql_query)
             
         except Exception as e:
             self.logger.error(f"Error validating query safety: {str(e)}")
@@ -427,20 +1053,88 @@ Respond with JSON format:
                 'error': str(e)
             }
     
-    def _format_schema_for_ai(self, schema: Dict[str, Any]) -> str:
+    def run_parallel(self, *callables: Callable[[], T]) -> List[T]:
+        """Run independent blocking calls concurrently and return their results in argument order"""
+        app = current_app._get_current_object()
+        
+        def in_app_context(func: Callable[[], T]) -> T:
+            # Worker threads need the app context for the OpenRouter settings
+            with app.app_context():
+                return func()
+        
+        futures = [self._executor.submit(in_app_context, func) for func in callables]
+        return [future.result() for future in futures]
+    
+    async def analyze_query_async(self, sql_query: str, schema: Union[Dict[str, Any], FormattedSchema],
+                                  results: List[Dict], original_prompt: str,
+                                  model: Optional[str] = None) -> Dict[str, Any]:
+        """Run explanation, optimization and safety analysis of an executed query concurrently"""
+        explanation, optimizations, safety = await asyncio.gather(
+            self.explain_query_results_async(results, original_prompt, sql_query, model=model),
+            self.suggest_optimizations_async(sql_query, schema, model=model),
+            self.validate_query_safety_async(sql_query, model=model)
+        )
+        
+        return {
+            'explanation': explanation,
+            'optimizations': optimizations,
+            'safety': safety
+        }
+    
+    def analyze_query(self, sql_query: str, schema: Union[Dict[str, Any], FormattedSchema],
+                      results: List[Dict], original_prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Synchronous variant of analyze_query_async that fans the three calls out to threads"""
+        explanation, optimizations, safety = self.run_parallel(
+            functools.partial(self.explain_query_results, results, original_prompt, sql_query, model=model),
+            functools.partial(self.suggest_optimizations, sql_query, schema, model=model),
+            functools.partial(self.validate_query_safety, sql_query, model=model)
+        )
+        
+        return {
+            'explanation': explanation,
+            'optimizations': optimizations,
+            'safety': safety
+        }
+    
+    def _schema_fingerprint(self, schema: Dict[str, Any]) -> tuple:
+        """Hashable fingerprint of everything _format_schema_for_ai renders"""
+        return tuple(
+            (table_name, table_info.row_count,
+             tuple((c.name, c.type, c.primary_key, c.not_null) for c in table_info.columns))
+            for table_name, table_info in schema.get('tables', {}).items()
+        )
+    
+    def prepare_schema(self, schema: Union[Dict[str, Any], FormattedSchema]) -> FormattedSchema:
+        """Format a schema once so it can be passed to several AI calls for the same request"""
+        if isinstance(schema, FormattedSchema):
+            return schema
+        
+        fingerprint = self._schema_fingerprint(schema)
+        formatted = self._schema_cache.get(fingerprint)
+        if formatted is not None:
+            return formatted
+        
+        schema_text = "\n".join(
+            f"Table: {table_name}\n"
+            + "".join(
+                f"  - {name} ({column_type})"
+                f"{' [PRIMARY KEY]' if primary_key else ''}"
+                f"{' [NOT NULL]' if not_null else ''}\n"
+                for name, column_type, primary_key, not_null in columns
+            )
+            + f"  Rows: {row_count}\n"
+            for table_name, row_count, columns in fingerprint
+        )
+        formatted = FormattedSchema(
+            text=schema_text,
+            fingerprint=hashlib.sha256(schema_text.encode()).hexdigest()
+        )
+        
+        if len(self._schema_cache) >= self.SCHEMA_CACHE_MAX_SIZE:
+            self._schema_cache.clear()
+        self._schema_cache[fingerprint] = formatted
+        return formatted
+    
+    def _format_schema_for_ai(self, schema: Union[Dict[str, Any], FormattedSchema]) -> str:
         """Format database schema for AI prompts"""
-        schema_lines = []
-        
-        for table_name, table_info in schema.get('tables', {}).items():
-            schema_lines.append(f"Table: {table_name}")
-            for column in table_info.columns:
-                column_def = f"  - {column.name} ({column.type})"
-                if column.primary_key:
-                    column_def += " [PRIMARY KEY]"
-                if column.not_null:
-                    column_def += " [NOT NULL]"
-                schema_lines.append(column_def)
-            schema_lines.append(f"  Rows: {table_info.row_count}")
-            schema_lines.append("")
-        
-        return "\n".join(schema_lines)
\ No newline at end of file
+        return self.prepare_schema(schema).text
\ No newline at end of file
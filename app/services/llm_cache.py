@@ -0,0 +1,147 @@
+import hashlib
+import orjson
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+class LLMCache:
+    """In-memory LRU cache with TTL for deterministic LLM responses"""
+    
+    def __init__(self, max_size: int = 512, ttl: int = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float, **params: Any) -> str:
+        """Build a stable cache key from the request inputs that determine the response"""
+        raw = orjson.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, **params},
+            option=orjson.OPT_SORT_KEYS
+        )
+        return hashlib.sha256(raw).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return response
+    
+    def set(self, key: str, response: Dict[str, Any], ttl: Optional[int] = None):
+        """Store a response, evicting the least recently used entry when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Remove all cached responses"""
+        with self._lock:
+            self._entries.clear()
+
+class SemanticCache:
+    """Approximate-match cache that reuses a stored value for prompts in the same partition that differ only in filler words"""
+    
+    _TOKEN_RE = re.compile(r"\w+")
+    # Comparison operators and "n't" contractions, which the word tokens do not capture
+    _OPERATOR_RE = re.compile(r"<>|[<>!]=|[<>=]|n't\b")
+    # Filler words that may differ between prompts; every other word, number and operator must match exactly
+    _STOPWORDS = frozenset((
+        'a', 'an', 'the', 'please', 'me', 'us', 'i', 'we', 'you', 'can', 'could', 'would', 'will',
+        'show', 'list', 'give', 'get', 'display', 'find', 'tell', 'what', 'which', 'is', 'are',
+        'was', 'were', 'do', 'does', 'there', 'of'
+    ))
+    
+    def __init__(self, threshold: float = 0.92, max_entries: int = 256, max_partitions: int = 64):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_partitions = max_partitions
+        # partition -> OrderedDict(normalized prompt -> (vector, guard terms, value))
+        self._partitions: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def _vectorize(cls, text: str) -> Tuple[str, Dict[str, float], Tuple[str, ...]]:
+        """Return the normalized text, its L2-normalized unigram + bigram count vector and its guard terms"""
+        text = text.lower()
+        tokens = cls._TOKEN_RE.findall(text)
+        features: Dict[str, float] = {}
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            features[feature] = features.get(feature, 0.0) + 1.0
+        
+        norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+        
+        # Names, values, numbers, negations and operators all change the SQL, so only filler words may differ
+        guard = tuple(sorted(
+            [t for t in tokens if t not in cls._STOPWORDS] + cls._OPERATOR_RE.findall(text)
+        ))
+        return " ".join(tokens), {k: v / norm for k, v in features.items()}, guard
+    
+    @staticmethod
+    def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+        """Cosine similarity of two normalized sparse vectors"""
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(v * b.get(k, 0.0) for k, v in a.items())
+    
+    def get(self, partition: str, text: str) -> Optional[Any]:
+        """Return the value stored for the most similar prompt with the same guard terms if it clears the threshold"""
+        normalized, vector, guard = self._vectorize(text)
+        with self._lock:
+            entries = self._partitions.get(partition)
+            if not entries:
+                return None
+            
+            self._partitions.move_to_end(partition)
+            entry = entries.get(normalized)
+            if entry is not None and entry[1] == guard:
+                entries.move_to_end(normalized)
+                return entry[2]
+            
+            best_key, best_score = None, 0.0
+            for key, (cached_vector, cached_guard, _) in entries.items():
+                if cached_guard != guard:
+                    continue
+                score = self._cosine(vector, cached_vector)
+                if score > best_score:
+                    best_key, best_score = key, score
+            
+            if best_key is None or best_score <= self.threshold:
+                return None
+            
+            entries.move_to_end(best_key)
+            return entries[best_key][2]
+    
+    def set(self, partition: str, text: str, value: Any):
+        """Store a value for a prompt, evicting the least recently used prompts and partitions"""
+        normalized, vector, guard = self._vectorize(text)
+        with self._lock:
+            entries = self._partitions.setdefault(partition, OrderedDict())
+            self._partitions.move_to_end(partition)
+            entries[normalized] = (vector, guard, value)
+            entries.move_to_end(normalized)
+            
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            while len(self._partitions) > self.max_partitions:
+                self._partitions.popitem(last=False)
+    
+    def clear(self):
+        """Remove all cached values"""
+        with self._lock:
+            self._partitions.clear()
\ No newline at end of file
@@ -1,18 +1,31 @@
 import re
+import functools
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Set, FrozenSet, Tuple
 from app.models.schemas import QueryType
 
 class NaturalLanguageParser:
     """Parses natural language queries and extracts intent and entities"""
     
+    PARSE_CACHE_SIZE = 512  # distinct normalized queries whose parse results are memoized
+    CONFIDENCE_WEIGHTS = (
+        ('tables', 0.2),
+        ('columns', 0.2),
+        ('filters', 0.15),
+        ('aggregations', 0.1),
+        ('sorting', 0.05)
+    )
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self._init_patterns()
+        # Per-instance cache so it does not keep the parser alive through a class-level reference
+        self._parse_cached = functools.lru_cache(maxsize=self.PARSE_CACHE_SIZE)(self._parse_frozen)
     
     def _init_patterns(self):
-        """Initialize regex patterns for query parsing"""
-        self.patterns = {
+        """Initialize and compile regex patterns for query parsing"""
+        raw_patterns = {
             'select_keywords': [
                 r'\b(show|display|list|get|find|select|retrieve)\b',
                 r'\b(what|which|how many)\b',
@@ -56,19 +69,110 @@ class NaturalLanguageParser:
                 r'\b(\d+)\s+(rows?|records?)\b'
             ]
         }
+        self.patterns = {
+            category: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for category, patterns in raw_patterns.items()
+        }
+        
+        # Intent keywords are plain words, so they are matched against the query's tokens by set lookup
+        self._word_pattern = re.compile(r'\w+')
+        self._count_words = frozenset({'count', 'total', 'sum', 'average', 'avg', 'max', 'min'})
+        # Phrase keywords keep a regex, run only when their first word is present
+        self._count_phrase_pattern = (re.compile(r'\b(number of|how many)\b', re.IGNORECASE), frozenset({'number', 'how'}))
+        self._all_every_pattern = (re.compile(r'\b(all|every)\s+\w+', re.IGNORECASE), frozenset({'all', 'every'}))
+        self._select_words = frozenset({'show', 'display', 'list', 'get', 'find', 'select', 'retrieve', 'what', 'which'})
+        self._insert_words = frozenset({'add', 'insert', 'create', 'new', 'record', 'entry', 'row'})
+        self._update_words = frozenset({'update', 'modify', 'change', 'edit', 'set', 'to'})
+        self._delete_words = frozenset({'delete', 'remove', 'drop'})
+        self._common_tables = frozenset({'users', 'products', 'orders', 'customers', 'items', 'data'})
+        # Indicator words that the table/column patterns can capture but that are never names
+        self._table_keywords = frozenset({'table', 'from', 'in', 'on'})
+        self._column_keywords = frozenset({'column', 'field'})
+        
+        # Patterns used directly by the extractors, each paired with the words it cannot match without;
+        # a pattern is only run when one of its words is among the query's tokens
+        self._table_patterns = list(zip(self.patterns['table_indicators'], [
+            frozenset({'table', 'from'}),
+            frozenset({'in', 'on'})
+        ]))
+        self._column_patterns = list(zip(self.patterns['column_indicators'], [
+            frozenset({'column', 'field'}),
+            frozenset({'column', 'field'})
+        ]))
+        self._select_columns_pattern = (
+            re.compile(r'\b(show|get|display)\s+(\w+(?:,\s*\w+)*)\b', re.IGNORECASE),
+            frozenset({'show', 'get', 'display'})
+        )
+        self._where_patterns = [
+            (re.compile(r'\bwhere\s+(\w+)\s*(=|>|<|>=|<=|!=|like)\s*([\w\s\'"]+)', re.IGNORECASE),
+             frozenset({'where'})),
+            (re.compile(r'\b(\w+)\s+(is|equals?|contains?)\s+([\w\s\'"]+)', re.IGNORECASE),
+             frozenset({'is', 'equal', 'equals', 'contain', 'contains'})),
+            (re.compile(r'\b(\w+)\s+(greater than|less than|equal to)\s+([\w\s\'"]+)', re.IGNORECASE),
+             frozenset({'greater', 'less', 'equal'}))
+        ]
+        self._agg_patterns = [
+            (re.compile(r'\b(count|sum|average|avg|max|min)\s+(?:of\s+)?(\w+)', re.IGNORECASE),
+             frozenset({'count', 'sum', 'average', 'avg', 'max', 'min'})),
+            (re.compile(r'\b(total|number of)\s+(\w+)', re.IGNORECASE),
+             frozenset({'total', 'number'})),
+            (re.compile(r'\bhow many\s+(\w+)', re.IGNORECASE),
+             frozenset({'how'}))
+        ]
+        self._sort_patterns = [
+            (re.compile(r'\border\s+by\s+(\w+)\s*(asc|desc|ascending|descending)?', re.IGNORECASE),
+             frozenset({'order'})),
+            (re.compile(r'\bsort\s+by\s+(\w+)\s*(asc|desc|ascending|descending)?', re.IGNORECASE),
+             frozenset({'sort'}))
+        ]
+        # All limit forms in one alternation; when several occur, the earlier form in this list wins
+        self._limit_pattern = re.compile(r'\b(limit|top|first)\s+(\d+)|\b(\d+)\s+rows?', re.IGNORECASE)
+        self._limit_priority = {'limit': 0, 'top': 1, 'first': 2}  # "<n> rows" ranks last
+        self._digit_pattern = re.compile(r'\d')
     
     def parse_query(self, query: str) -> Dict[str, Any]:
         """Parse natural language query and extract structured information"""
-        query_lower = query.lower().strip()
+        # Repeated queries reuse the read-only cached parse; callers get fresh lists and dicts built from it
+        cached = self._parse_cached(query.lower().strip())
+        sorting = cached['sorting']
+        return {
+            **cached,
+            'original_query': query,
+            'tables': list(cached['tables']),
+            'columns': list(cached['columns']),
+            'filters': [dict(condition) for condition in cached['filters']],
+            'aggregations': [dict(aggregation) for aggregation in cached['aggregations']],
+            'sorting': dict(sorting) if sorting is not None else None,
+            'suggestions': list(cached['suggestions'])
+        }
+    
+    def _parse_frozen(self, query_lower: str) -> Mapping[str, Any]:
+        """Parse a query into the immutable form kept in the parse cache"""
+        result = self._parse_normalized(query_lower)
+        sorting = result['sorting']
+        return MappingProxyType({
+            **result,
+            'tables': tuple(result['tables']),
+            'columns': tuple(result['columns']),
+            'filters': tuple(MappingProxyType(condition) for condition in result['filters']),
+            'aggregations': tuple(MappingProxyType(aggregation) for aggregation in result['aggregations']),
+            'sorting': MappingProxyType(sorting) if sorting is not None else None,
+            'suggestions': tuple(result['suggestions'])
+        })
+    
+    def _parse_normalized(self, query_lower: str) -> Dict[str, Any]:
+        """Parse an already lowercased and stripped query"""
+        words = self._word_pattern.findall(query_lower)
+        tokens = set(words)
         
         result = {
-            'original_query': query,
-            'query_type': self._determine_query_type(query_lower),
-            'tables': self._extract_tables(query_lower),
-            'columns': self._extract_columns(query_lower),
-            'filters': self._extract_filters(query_lower),
-            'aggregations': self._extract_aggregations(query_lower),
-            'sorting': self._extract_sorting(query_lower),
+            'original_query': query_lower,
+            'query_type': self._determine_query_type(query_lower, tokens),
+            'tables': self._extract_tables(query_lower, words, tokens),
+            'columns': self._extract_columns(query_lower, tokens),
+            'filters': self._extract_filters(query_lower, tokens),
+            'aggregations': self._extract_aggregations(query_lower, tokens),
+            'sorting': self._extract_sorting(query_lower, tokens),
             'limit': self._extract_limit(query_lower),
             'confidence': 0.0,
             'suggestions': []
@@ -82,90 +186,96 @@ class NaturalLanguageParser:
         
         return result
     
-    def _determine_query_type(self, query: str) -> QueryType:
+    def _determine_query_type(self, query: str, tokens: Set[str]) -> QueryType:
         """Determine the type of query based on keywords"""
         # Check for count/aggregate operations first
-        for pattern in self.patterns['count_keywords']:
-            if re.search(pattern, query, re.IGNORECASE):
-                return QueryType.COUNT
-        
-        # Check for CRUD operations
-        for pattern in self.patterns['select_keywords']:
-            if re.search(pattern, query, re.IGNORECASE):
-                return QueryType.SELECT
-        
-        for pattern in self.patterns['insert_keywords']:
-            if re.search(pattern, query, re.IGNORECASE):
-                return QueryType.INSERT
-        
-        for pattern in self.patterns['update_keywords']:
-            if re.search(pattern, query, re.IGNORECASE):
-                return QueryType.UPDATE
-        
-        for pattern in self.patterns['delete_keywords']:
-            if re.search(pattern, query, re.IGNORECASE):
-                return QueryType.DELETE
+        if tokens & self._count_words or self._matches(self._count_phrase_pattern, query, tokens):
+            return QueryType.COUNT
+        
+        # Check for CRUD operations; "all <word>" and "every <word>" also read as a select
+        if tokens & self._select_words or self._matches(self._all_every_pattern, query, tokens):
+            return QueryType.SELECT
+        if tokens & self._insert_words:
+            return QueryType.INSERT
+        if tokens & self._update_words:
+            return QueryType.UPDATE
+        if tokens & self._delete_words:
+            return QueryType.DELETE
         
         return QueryType.UNKNOWN
     
-    def _extract_tables(self, query: str) -> List[str]:
+    @staticmethod
+    def _matches(gated_pattern: Tuple[Any, FrozenSet[str]], query: str, tokens: Set[str]) -> bool:
+        """Search with a pattern only when one of the words it requires is among the query's tokens"""
+        pattern, required = gated_pattern
+        return not required.isdisjoint(tokens) and pattern.search(query) is not None
+    
+    def _extract_tables(self, query: str, words: List[str], tokens: Set[str]) -> List[str]:
         """Extract table names from the query"""
         tables = []
+        seen = set()
         
-        for pattern in self.patterns['table_indicators']:
-            matches = re.finditer(pattern, query, re.IGNORECASE)
+        for pattern, required in self._table_patterns:
+            if required.isdisjoint(tokens):
+                continue
+            matches = pattern.finditer(query)
             for match in matches:
-                if len(match.groups()) > 0:
+                if match.lastindex:
                     table_name = match.group(1)
-                    if table_name and table_name not in ['table', 'from', 'in', 'on']:
+                    if table_name and table_name not in self._table_keywords and table_name not in seen:
+                        seen.add(table_name)
                         tables.append(table_name)
         
-        # Also look for common table names without indicators
-        common_table_words = ['users', 'products', 'orders', 'customers', 'items', 'data']
-        for word in common_table_words:
-            if word in query and word not in tables:
+        # Also look for common table names without indicators, in the order they appear
+        for word in words:
+            if word in self._common_tables and word not in seen:
+                seen.add(word)
                 tables.append(word)
         
-        return list(set(tables))
+        return tables
     
-    def _extract_columns(self, query: str) -> List[str]:
+    def _extract_columns(self, query: str, tokens: Set[str]) -> List[str]:
         """Extract column names from the query"""
         columns = []
+        seen = set()
         
         # Look for explicit column mentions
-        for pattern in self.patterns['column_indicators']:
-            matches = re.finditer(pattern, query, re.IGNORECASE)
+        for pattern, required in self._column_patterns:
+            if required.isdisjoint(tokens):
+                continue
+            matches = pattern.finditer(query)
             for match in matches:
-                if len(match.groups()) > 0:
+                if match.lastindex:
                     column_name = match.group(1)
-                    if column_name and column_name not in ['column', 'field']:
+                    if column_name and column_name not in self._column_keywords and column_name not in seen:
+                        seen.add(column_name)
                         columns.append(column_name)
         
         # Look for SELECT-like patterns
-        select_pattern = r'\b(show|get|display)\s+(\w+(?:,\s*\w+)*)\b'
-        matches = re.finditer(select_pattern, query, re.IGNORECASE)
+        pattern, required = self._select_columns_pattern
+        matches = pattern.finditer(query) if not required.isdisjoint(tokens) else ()
         for match in matches:
-            if len(match.groups()) > 1:
+            if match.lastindex and match.lastindex > 1:
                 column_list = match.group(2)
-                columns.extend([col.strip() for col in column_list.split(',')])
+                for col in column_list.split(','):
+                    col = col.strip()
+                    if col not in seen:
+                        seen.add(col)
+                        columns.append(col)
         
-        return list(set(columns))
+        return columns
     
-    def _extract_filters(self, query: str) -> List[Dict[str, Any]]:
+    def _extract_filters(self, query: str, tokens: Set[str]) -> List[Dict[str, Any]]:
         """Extract filter conditions from the query"""
         filters = []
         
         # Look for WHERE-like conditions
-        where_patterns = [
-            r'\bwhere\s+(\w+)\s*(=|>|<|>=|<=|!=|like)\s*([\w\s\'"]+)',
-            r'\b(\w+)\s+(is|equals?|contains?)\s+([\w\s\'"]+)',
-            r'\b(\w+)\s+(greater than|less than|equal to)\s+([\w\s\'"]+)'
-        ]
-        
-        for pattern in where_patterns:
-            matches = re.finditer(pattern, query, re.IGNORECASE)
+        for pattern, required in self._where_patterns:
+            if required.isdisjoint(tokens):
+                continue
+            matches = pattern.finditer(query)
             for match in matches:
-                if len(match.groups()) >= 3:
+                if match.lastindex and match.lastindex >= 3:
                     filters.append({
                         'column': match.group(1),
                         'operator': match.group(2),
@@ -174,18 +284,14 @@ class NaturalLanguageParser:
         
         return filters
     
-    def _extract_aggregations(self, query: str) -> List[Dict[str, Any]]:
+    def _extract_aggregations(self, query: str, tokens: Set[str]) -> List[Dict[str, Any]]:
         """Extract aggregation functions from the query"""
         aggregations = []
         
-        agg_patterns = [
-            r'\b(count|sum|average|avg|max|min)\s+(?:of\s+)?(\w+)',
-            r'\b(total|number of)\s+(\w+)',
-            r'\bhow many\s+(\w+)'
-        ]
-        
-        for pattern in agg_patterns:
-            matches = re.finditer(pattern, query, re.IGNORECASE)
+        for pattern, required in self._agg_patterns:
+            if required.isdisjoint(tokens):
+                continue
+            matches = pattern.finditer(query)
             for match in matches:
                 func = match.group(1).lower()
                 if func in ['total', 'number of', 'how many']:
@@ -195,23 +301,20 @@ class NaturalLanguageParser:
                 
                 aggregations.append({
                     'function': func,
-                    'column': match.group(2) if len(match.groups()) > 1 else '*'
+                    'column': match.group(2) if match.lastindex and match.lastindex > 1 else '*'
                 })
         
         return aggregations
     
-    def _extract_sorting(self, query: str) -> Optional[Dict[str, Any]]:
+    def _extract_sorting(self, query: str, tokens: Set[str]) -> Optional[Dict[str, Any]]:
         """Extract sorting information from the query"""
-        sort_patterns = [
-            r'\border\s+by\s+(\w+)\s*(asc|desc|ascending|descending)?',
-            r'\bsort\s+by\s+(\w+)\s*(asc|desc|ascending|descending)?'
-        ]
-        
-        for pattern in sort_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
+        for pattern, required in self._sort_patterns:
+            if required.isdisjoint(tokens):
+                continue
+            match = pattern.search(query)
             if match:
                 direction = 'ASC'
-                if len(match.groups()) > 1 and match.group(2):
+                if match.lastindex and match.lastindex > 1:
                     direction = 'DESC' if match.group(2).lower() in ['desc', 'descending'] else 'ASC'
                 
                 return {
@@ -223,47 +326,30 @@ class NaturalLanguageParser:
     
     def _extract_limit(self, query: str) -> Optional[int]:
         """Extract limit/top N information from the query"""
-        limit_patterns = [
-            r'\blimit\s+(\d+)',
-            r'\btop\s+(\d+)',
-            r'\bfirst\s+(\d+)',
-            r'\b(\d+)\s+rows?'
-        ]
-        
-        for pattern in limit_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return int(match.group(1))
-        
-        return None
+        # Most queries have no digits at all, and every limit form needs one
+        if not self._digit_pattern.search(query):
+            return None
+        
+        limit, best_rank = None, len(self._limit_priority) + 1
+        for match in self._limit_pattern.finditer(query):
+            keyword = match.group(1)
+            rank = self._limit_priority[keyword.lower()] if keyword else len(self._limit_priority)
+            if rank < best_rank:
+                limit, best_rank = int(match.group(2) or match.group(3)), rank
+                if rank == 0:
+                    break
+        
+        return limit
     
     def _calculate_confidence(self, parsed_result: Dict[str, Any]) -> float:
         """Calculate confidence score for the parsed query"""
-        score = 0.0
-        
         # Base score for query type identification
-        if parsed_result['query_type'] != QueryType.UNKNOWN:
-            score += 0.3
-        
-        # Score for table identification
-        if parsed_result['tables']:
-            score += 0.2
+        score = 0.3 if parsed_result['query_type'] != QueryType.UNKNOWN else 0.0
         
-        # Score for column identification
-        if parsed_result['columns']:
-            score += 0.2
-        
-        # Score for filters
-        if parsed_result['filters']:
-            score += 0.15
-        
-        # Score for aggregations
-        if parsed_result['aggregations']:
-            score += 0.1
-        
-        # Score for sorting
-        if parsed_result['sorting']:
-            score += 0.05
+        # Add the weight of each extracted component that is present
+        for key, weight in self.CONFIDENCE_WEIGHTS:
+            if parsed_result[key]:
+                score += weight
         
         return min(score, 1.0)
     
@@ -290,32 +376,31 @@ class NaturalLanguageParser:
         query_type = parsed_result['query_type']
         
         if query_type == QueryType.SELECT or query_type == QueryType.COUNT:
-            columns = ', '.join(parsed_result['columns']) if parsed_result['columns'] else '*'
-            
+            # Clauses are collected and joined once rather than grown with repeated concatenation
             if parsed_result['aggregations']:
-                agg_parts = []
-                for agg in parsed_result['aggregations']:
-                    agg_parts.append(f"{agg['function'].upper()}({agg['column']})")
-                columns = ', '.join(agg_parts)
+                columns = ', '.join(f"{agg['function'].upper()}({agg['column']})" for agg in parsed_result['aggregations'])
+            else:
+                columns = ', '.join(parsed_result['columns']) if parsed_result['columns'] else '*'
             
-            sql = f"SELECT {columns}"
+            parts = [f"SELECT {columns}"]
             
             if parsed_result['tables']:
-                sql += f" FROM {parsed_result['tables'][0]}"
+                parts.append(f"FROM {parsed_result['tables'][0]}")
             
             if parsed_result['filters']:
-                where_parts = []
-                for filter_item in parsed_result['filters']:
-                    where_parts.append(f"{filter_item['column']} {filter_item['operator']} '{filter_item['value']}'")
-                sql += f" WHERE {' AND '.join(where_parts)}"
+                where_clause = ' AND '.join(
+                    f"{filter_item['column']} {filter_item['operator']} '{filter_item['value']}'"
+                    for filter_item in parsed_result['filters']
+                )
+                parts.append(f"WHERE {where_clause}")
             
             if parsed_result['sorting']:
                 sort_info = parsed_result['sorting']
-                sql += f" ORDER BY {sort_info['column']} {sort_info['direction']}"
+                parts.append(f"ORDER BY {sort_info['column']} {sort_info['direction']}")
             
             if parsed_result['limit']:
-                sql += f" LIMIT {parsed_result['limit']}"
+                parts.append(f"LIMIT {parsed_result['limit']}")
             
-            return sql
+            return ' '.join(parts)
         
         return "-- Unable to generate SQL structure for this query type"
\ No newline at end of file
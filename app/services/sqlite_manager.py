@@ -1,29 +1,98 @@
 import sqlite3
 import os
 import json
-from typing import List, Dict, Any, Optional, Tuple
+import re
+import sys
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 from pathlib import Path
 import logging
 import threading
 
+# Statements that modify data or schema; word boundaries keep names like updated_at from matching
+_DANGEROUS_KEYWORD_RE = re.compile(r'\b(DROP|DELETE|TRUNCATE|ALTER|CREATE|INSERT|UPDATE)\b', re.IGNORECASE)
+
+# Anchored at the start, so only the leading keyword is examined however long the query is
+_SELECT_RE = re.compile(r'\s*SELECT', re.IGNORECASE)
+
+def is_select_query(query: str) -> bool:
+    """Whether a query is a SELECT and so returns rows"""
+    return _SELECT_RE.match(query) is not None
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for safe interpolation into SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
 class SQLiteManager:
     """Manages SQLite database connections and operations"""
     
+    MAX_IDLE_CONNECTIONS = 4  # idle connections kept open per database for reuse
+    STREAM_CHUNK_SIZE = 1000  # rows fetched per chunk by stream_query
+    
     def __init__(self):
-        self.database_paths = {}  # Store paths instead of connections
+        self.database_paths = {}  # Store paths for loaded databases
+        self._connections = {}  # db_name -> list of idle connections, opened lazily and reused
+        self._table_cache = {}  # db_name -> (file signature, table names) for list_databases
         self.logger = logging.getLogger(__name__)
-        self._lock = threading.Lock()
+        self._lock = threading.Lock()  # serializes load/create/close; queries do not take it
     
-    def _get_connection(self, db_name: str) -> sqlite3.Connection:
-        """Get a new connection for the specified database"""
-        if db_name not in self.database_paths:
-            raise ValueError(f"Database {db_name} not loaded")
-        
-        file_path = self.database_paths[db_name]
+    def _open_connection(self, file_path: str) -> sqlite3.Connection:
+        """Open a connection that is kept and reused across requests"""
         conn = sqlite3.connect(file_path, check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+            conn.execute("PRAGMA mmap_size=268435456")  # serve reads from a 256 MB memory map
+            conn.execute("PRAGMA temp_store=MEMORY")
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not apply connection PRAGMAs for {file_path}: {str(e)}")
         return conn
     
+    @contextmanager
+    def _get_connection(self, db_name: str) -> Iterator[sqlite3.Connection]:
+        """Borrow an idle pooled connection for the specified database, opening one if none is free"""
+        # Lock-free on the query path: single dict and list operations are atomic under the GIL, and
+        # each idle connection is handed out by exactly one pop
+        file_path = self.database_paths.get(db_name)
+        if file_path is None:
+            raise ValueError(f"Database {db_name} not loaded")
+        
+        pool = self._connections.setdefault(db_name, [])
+        try:
+            conn = pool.pop()
+        except IndexError:
+            conn = None
+        
+        # Concurrent requests each get their own connection, so WAL readers never wait on each other
+        if conn is None:
+            conn = self._open_connection(file_path)
+        
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            
+            # Return the connection unless the database was closed or reloaded while it was borrowed;
+            # one that races a close onto the dropped pool is closed when that pool is collected
+            if self._connections.get(db_name) is pool and len(pool) < self.MAX_IDLE_CONNECTIONS:
+                pool.append(conn)
+            else:
+                conn.close()
+    
+    def _close_connection(self, db_name: str):
+        """Close and forget the idle pooled connections for a database; caller must hold self._lock"""
+        self._table_cache.pop(db_name, None)
+        pool = self._connections.pop(db_name, [])
+        # Pop rather than iterate so a concurrent borrower and this close never share a connection
+        while True:
+            try:
+                pool.pop().close()
+            except IndexError:
+                break
+    
     def load_database(self, file_path: str) -> Dict[str, Any]:
         """Load a SQLite database and return connection info"""
         try:
@@ -38,11 +107,19 @@ class SQLiteManager:
             cursor = conn.cursor()
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
             tables = [row[0] for row in cursor.fetchall()]
+            
+            # Refresh planner statistics once so pooled connections start with good query plans
+            try:
+                conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not optimize database {file_path}: {str(e)}")
             conn.close()  # Close test connection
             
             # Store database path
             db_id = os.path.basename(file_path)
             with self._lock:
+                if self.database_paths.get(db_id) != file_path:
+                    self._close_connection(db_id)
                 self.database_paths[db_id] = file_path
             
             return {
@@ -60,11 +137,16 @@ class SQLiteManager:
     def create_database(self, file_path: str, schema_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new SQLite database with the given schema"""
         try:
-            # Create new database connection
-            conn = sqlite3.connect(file_path, check_same_thread=False)
+            # Create new database connection; transactions are managed explicitly below
+            conn = sqlite3.connect(file_path, check_same_thread=False, isolation_level=None)
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
+            # Build the whole database in one transaction with an in-memory journal, so creation
+            # costs a single sync; a failed build deletes the file anyway
+            cursor.execute("PRAGMA journal_mode=MEMORY")
+            cursor.execute("BEGIN")
+            
             # Execute CREATE TABLE statements
             tables = []
             for table_info in schema_data.get('tables', []):
@@ -97,6 +179,8 @@ class SQLiteManager:
             # Store database path
             db_id = os.path.basename(file_path)
             with self._lock:
+                if self.database_paths.get(db_id) != file_path:
+                    self._close_connection(db_id)
                 self.database_paths[db_id] = file_path
             
             return {
@@ -119,35 +203,56 @@ class SQLiteManager:
     
     def list_databases(self) -> List[Dict[str, Any]]:
         """List all loaded databases"""
+        loaded = list(self.database_paths.items())
+        
         databases = []
-        with self._lock:
-            for db_id, file_path in self.database_paths.items():
-                # Get tables for each database
-                tables = []
+        for db_id, file_path in loaded:
+            signature = self._file_signature(file_path)
+            
+            # Get tables for each database, reusing the last listing while its files are unchanged
+            tables = []
+            cached = self._table_cache.get(db_id)
+            if cached is not None and cached[0] == signature:
+                tables = cached[1]
+            elif signature is not None:
                 try:
-                    conn = self._get_connection(db_id)
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-                    tables = [row[0] for row in cursor.fetchall()]
-                    conn.close()
+                    with self._get_connection(db_id) as conn:
+                        cursor = conn.cursor()
+                        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+                        tables = [row[0] for row in cursor.fetchall()]
+                    self._table_cache[db_id] = (signature, tables)
                 except Exception as e:
                     self.logger.error(f"Error getting tables for {db_id}: {str(e)}")
-                
-                databases.append({
-                    'id': db_id,
-                    'path': file_path,
-                    'tables': tables,
-                    'size': os.path.getsize(file_path) if os.path.exists(file_path) else 0,
-                    'status': 'connected' if os.path.exists(file_path) else 'disconnected'
-                })
+            
+            databases.append({
+                'id': db_id,
+                'path': file_path,
+                'tables': list(tables),
+                'size': signature[1] if signature else 0,
+                'status': 'connected' if signature else 'disconnected'
+            })
         return databases
     
-    def get_database_schema(self, db_name: str) -> Dict[str, Any]:
-        """Get detailed schema information for a database"""
-        conn = self._get_connection(db_name)
-        cursor = conn.cursor()
+    @staticmethod
+    def _file_signature(file_path: str) -> Optional[Tuple]:
+        """Return (mtime, size, WAL state) for a database file with one stat each, or None if it is missing"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
         
+        # Committed changes may still live only in the WAL file, so it is part of the signature
         try:
+            wal = os.stat(file_path + '-wal')
+            wal_state = (wal.st_mtime_ns, wal.st_size)
+        except OSError:
+            wal_state = None
+        return (st.st_mtime_ns, st.st_size, wal_state)
+    
+    def get_database_schema(self, db_name: str) -> Dict[str, Any]:
+        """Get detailed schema information for a database"""
+        with self._get_connection(db_name) as conn:
+            cursor = conn.cursor()
             schema = {'tables': {}}
             
             # Get all tables
@@ -179,84 +284,142 @@ class SQLiteManager:
                 }
             
             return schema
-        finally:
-            conn.close()
     
     def execute_query(self, query: str, db_name: str, params: Optional[Tuple] = None) -> Dict[str, Any]:
         """Execute a SQL query and return results"""
-        conn = self._get_connection(db_name)
-        cursor = conn.cursor()
-        
-        try:
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
+        with self._get_connection(db_name) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples are cheaper to fetch than sqlite3.Row for dict building
             
-            # Check if it's a SELECT query
-            if query.strip().upper().startswith('SELECT'):
-                results = cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
                 
+                # Check if it's a SELECT query
+                if _SELECT_RE.match(query):
+                    results = cursor.fetchall()
+                    columns = [description[0] for description in cursor.description]
+                    # Interned keys are shared by every row dict and hash once across queries
+                    keys = tuple(map(sys.intern, columns))
+                    
+                    return {
+                        'success': True,
+                        'data': [dict(zip(keys, row)) for row in results],
+                        'columns': columns,
+                        'row_count': len(results)
+                    }
+                else:
+                    # For INSERT, UPDATE, DELETE
+                    conn.commit()
+                    self._table_cache.pop(db_name, None)
+                    return {
+                        'success': True,
+                        'message': f"Query executed successfully. {cursor.rowcount} rows affected.",
+                        'rows_affected': cursor.rowcount
+                    }
+                    
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Error executing query: {str(e)}")
                 return {
-                    'success': True,
-                    'data': [dict(zip(columns, row)) for row in results],
-                    'columns': columns,
-                    'row_count': len(results)
+                    'success': False,
+                    'error': str(e)
                 }
-            else:
-                # For INSERT, UPDATE, DELETE
+    
+    def stream_query(self, query: str, db_name: str, params: Optional[Tuple] = None,
+                     chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Execute a SELECT query and yield its rows in chunks instead of materializing the whole result"""
+        chunk_size = chunk_size or self.STREAM_CHUNK_SIZE
+        with self._get_connection(db_name) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                
+                columns = [description[0] for description in cursor.description or ()]
+                keys = tuple(map(sys.intern, columns))
+                
+                # A short chunk marks the end; an exact multiple ends with one empty chunk
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    done = len(rows) < chunk_size
+                    yield {
+                        'success': True,
+                        'columns': columns,
+                        'chunk': [dict(zip(keys, row)) for row in rows],
+                        'done': done
+                    }
+                    if done:
+                        break
+                    
+            except Exception as e:
+                self.logger.error(f"Error streaming query: {str(e)}")
+                yield {
+                    'success': False,
+                    'error': str(e)
+                }
+    
+    def execute_many(self, query: str, db_name: str, params_seq: List[Tuple]) -> Dict[str, Any]:
+        """Execute a parameterized write query for every parameter tuple in a single transaction"""
+        with self._get_connection(db_name) as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.executemany(query, params_seq)
                 conn.commit()
+                self._table_cache.pop(db_name, None)
                 return {
                     'success': True,
                     'message': f"Query executed successfully. {cursor.rowcount} rows affected.",
                     'rows_affected': cursor.rowcount
                 }
-                
-        except Exception as e:
-            conn.rollback()
-            self.logger.error(f"Error executing query: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e)
-            }
-        finally:
-            conn.close()
+                    
+            except Exception as e:
+                conn.rollback()
+                self.logger.error(f"Error executing batch query: {str(e)}")
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
     
     def get_table_data(self, table_name: str, db_name: str, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
         """Get paginated data from a specific table"""
-        query = f"SELECT * FROM {table_name} LIMIT {limit} OFFSET {offset}"
-        return self.execute_query(query, db_name)
+        # Page bounds are bound parameters so every page reuses the same prepared statement
+        query = f"SELECT * FROM {quote_identifier(table_name)} LIMIT ? OFFSET ?"
+        return self.execute_query(query, db_name, (limit, offset))
     
     def close_database(self, db_name: str) -> bool:
-        """Remove a database from the manager"""
+        """Remove a database from the manager and close its pooled connection"""
         with self._lock:
             if db_name in self.database_paths:
+                self._close_connection(db_name)
                 del self.database_paths[db_name]
                 return True
         return False
     
     def close_all_databases(self):
-        """Remove all databases from the manager"""
+        """Remove all databases from the manager and close their pooled connections"""
         with self._lock:
+            for db_name in list(self._connections):
+                self._close_connection(db_name)
             self.database_paths.clear()
     
     def validate_query_safety(self, query: str) -> Dict[str, Any]:
         """Basic SQL injection and safety validation"""
-        dangerous_keywords = [
-            'DROP', 'DELETE', 'TRUNCATE', 'ALTER', 'CREATE', 'INSERT', 'UPDATE'
-        ]
-        
-        query_upper = query.upper().strip()
-        
-        # Check for dangerous operations
-        for keyword in dangerous_keywords:
-            if keyword in query_upper:
-                return {
-                    'safe': False,
-                    'warning': f"Query contains potentially dangerous operation: {keyword}",
-                    'requires_confirmation': True
-                }
+        # Check for dangerous operations in a single scan
+        match = _DANGEROUS_KEYWORD_RE.search(query)
+        if match:
+            return {
+                'safe': False,
+                'warning': f"Query contains potentially dangerous operation: {match.group(1).upper()}",
+                'requires_confirmation': True
+            }
         
         return {
             'safe': True,
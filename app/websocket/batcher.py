@@ -0,0 +1,72 @@
+import threading
+import orjson
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+class RoomBatcher:
+    """Coalesces messages queued for the same room into one list frame per flush window"""
+    
+    FLUSH_INTERVAL = 0.001  # seconds to keep collecting after the first queued message
+    MAX_BATCH_BYTES = 25 * 1024  # serialized size at which a batch is split into another frame
+    
+    def __init__(self, socketio, event: str = 'messages', flush_interval: Optional[float] = None,
+                 combine: Optional[Callable[[List[Dict[str, Any]]], Dict[str, Any]]] = None):
+        self.socketio = socketio
+        self.event = event
+        self.flush_interval = self.FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.combine = combine  # when set, turns each batch into a single message instead of a list
+        self._pending: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        # Held while a flush sends what it took from the queue, so no direct emit can overtake it
+        self._flush_lock = threading.RLock()
+        self._wakeup = None
+        self._started = False
+    
+    def enqueue(self, room: str, message: Dict[str, Any]):
+        """Queue a message for a room; it is emitted with the next flush"""
+        with self._lock:
+            self._pending[room].append(message)
+            if not self._started:
+                # Events and tasks come from the server so they match its async mode
+                self._wakeup = self.socketio.server.eio.create_event()
+                self.socketio.start_background_task(self._run)
+                self._started = True
+        self._wakeup.set()
+    
+    def flush(self):
+        """Emit every queued message, one frame per room and size-bounded batch"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(list)
+            
+            for room, messages in pending.items():
+                for batch in self._split(messages):
+                    self.socketio.emit(self.event, self.combine(batch) if self.combine else batch, room=room)
+    
+    def emit_after_pending(self, event: str, message: Dict[str, Any], room: str):
+        """Emit a message right away, once every message queued so far has been sent"""
+        with self._flush_lock:
+            self.flush()
+            self.socketio.emit(event, message, room=room)
+    
+    def _run(self):
+        """Background task that flushes shortly after messages arrive"""
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.socketio.sleep(self.flush_interval)
+            self.flush()
+    
+    def _split(self, messages: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """Group messages into batches of at most MAX_BATCH_BYTES; larger messages go alone"""
+        batch, size = [], 0
+        for message in messages:
+            message_size = len(orjson.dumps(message, default=str))
+            if batch and size + message_size > self.MAX_BATCH_BYTES:
+                yield batch
+                batch, size = [], 0
+            batch.append(message)
+            size += message_size
+        
+        if batch:
+            yield batch
\ No newline at end of file
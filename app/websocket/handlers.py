@@ -2,10 +2,18 @@ from flask_socketio import emit, join_room, leave_room, disconnect
 from flask import request, current_app
 import logging
 import json
-from typing import Dict, Any, Optional
+import sys
+import threading
+import time
+import functools
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from datetime import datetime
 from app.models.database import DatabaseModel
+from app.services.sqlite_manager import is_select_query
 from app.models.ai_service import AIService
+from app.websocket.batcher import RoomBatcher
 from app.models.schemas import (
     WebSocketMessage, QueryType, DatabaseStatus,
     NaturalLanguageQueryRequest, QueryRequest
@@ -17,420 +25,543 @@ db_model = DatabaseModel()
 ai_service = AIService(db_model)
 logger = logging.getLogger(__name__)
 
-# Store active connections
-active_connections: Dict[str, Dict[str, Any]] = {}
+# Natural language queries block on the LLM API, so they run here instead of on Socket.IO handler threads
+nl_query_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='nl-query')
 
-def serialize_websocket_message(message: WebSocketMessage) -> dict:
-    """Helper function to serialize WebSocketMessage with datetime handling"""
-    message_dict = message.dict()
-    if isinstance(message_dict.get('timestamp'), datetime):
-        message_dict['timestamp'] = message_dict['timestamp'].isoformat()
-    return message_dict
+class ConnectionInfo:
+    """Details kept for each connected client; slotted to stay small with many connections"""
+    __slots__ = ('connected_at', 'ip_address', 'user_agent', 'rooms')
+    
+    def __init__(self, connected_at: str, ip_address: Optional[str], user_agent: Optional[str]):
+        self.connected_at = connected_at
+        # Clients behind the same NAT or browser share one string object
+        self.ip_address = sys.intern(ip_address) if ip_address else ip_address
+        self.user_agent = sys.intern(user_agent) if user_agent else user_agent
+        self.rooms: Tuple[str, ...] = ()  # kept sorted, so listings report it as is
+
+# Store active connections, plus a running count of clients per room for the stats endpoint;
+# both are per process, so with several workers each one only sees its own clients
+active_connections: Dict[str, ConnectionInfo] = {}
+room_counts: Counter = Counter()
+_connections_lock = threading.Lock()
+
+# Bumped on every connection or room change so the active connections listing is rebuilt only when stale
+_connections_version = 0
+_connections_snapshot: Tuple[int, Dict[str, Any]] = (-1, {})
+
+def _connections_changed():
+    """Mark the active connections listing stale; call with _connections_lock held"""
+    global _connections_version
+    _connections_version += 1
+
+def _track_room_join(client_id: str, room_name: str):
+    """Record that a client joined a room"""
+    with _connections_lock:
+        info = active_connections.get(client_id)
+        if info is not None and room_name not in info.rooms:
+            info.rooms = tuple(sorted(info.rooms + (room_name,)))
+            room_counts[room_name] += 1
+            _connections_changed()
+
+def _track_room_leave(client_id: str, room_name: str):
+    """Record that a client left a room"""
+    with _connections_lock:
+        info = active_connections.get(client_id)
+        if info is not None and room_name in info.rooms:
+            info.rooms = tuple(room for room in info.rooms if room != room_name)
+            room_counts[room_name] -= 1
+            if not room_counts[room_name]:
+                del room_counts[room_name]
+            _connections_changed()
+
+def get_active_connections_info() -> Dict[str, Any]:
+    """Return this worker's active connections listing, rebuilt only after connections or rooms change"""
+    global _connections_snapshot
+    with _connections_lock:
+        version, snapshot = _connections_snapshot
+        if version != _connections_version:
+            snapshot = {
+                'total_connections': len(active_connections),
+                'connections': [
+                    {
+                        'client_id': client_id,
+                        'connected_at': info.connected_at,
+                        'rooms': info.rooms
+                    }
+                    for client_id, info in active_connections.items()
+                ]
+            }
+            _connections_snapshot = (_connections_version, snapshot)
+    
+    return snapshot
+
+# Handlers reuse a database's serialized info for a few seconds instead of refreshing the registry per message
+DATABASE_INFO_TTL = 5.0
+_database_info_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+@functools.lru_cache(maxsize=1024)
+def database_room(database_id: str) -> str:
+    """Name of the Socket.IO room that receives a database's updates"""
+    return f"database_{database_id}"
+
+def get_database_info_dict(database_id: str) -> Optional[Dict[str, Any]]:
+    """Return a JSON-ready snapshot of a database's info, reused for DATABASE_INFO_TTL seconds"""
+    now = time.monotonic()
+    cached = _database_info_cache.get(database_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    
+    db_info = db_model.get_database_info(database_id)
+    if not db_info:
+        return None  # not cached, so a newly loaded database is visible immediately
+    
+    # Convert DatabaseInfo to dict with proper datetime serialization
+    db_info_dict = {
+        'id': db_info.id,
+        'path': db_info.path,
+        'tables': db_info.tables,
+        'size': db_info.size,
+        'status': db_info.status.value,
+        'created_at': db_info.created_at.isoformat() if db_info.created_at else None,
+        'last_accessed': db_info.last_accessed.isoformat() if db_info.last_accessed else None
+    }
+    _database_info_cache[database_id] = (now + DATABASE_INFO_TTL, db_info_dict)
+    return db_info_dict
+
+def invalidate_database_info(database_id: str):
+    """Drop a database's cached info after it changes"""
+    _database_info_cache.pop(database_id, None)
+
+# Fixed-shape frames are built from these templates without a WebSocketMessage round-trip
+_PONG_TEMPLATE = {'type': 'pong', 'data': None, 'timestamp': None}
+_WELCOME_TEMPLATE = {'type': 'connection', 'data': None, 'timestamp': None}
+
+def compact_query_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace a result's list of row dicts with positional rows so column names are sent once"""
+    if not result.get('data') or 'columns' not in result:
+        return result
+    
+    compact = {key: value for key, value in result.items() if key != 'data'}
+    compact['rows'] = [list(row.values()) for row in result['data']]
+    return compact
+
+def _serialize_frame(message_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a message frame directly from its data, without validating a WebSocketMessage"""
+    return {'type': message_type, 'data': data, 'timestamp': datetime.now().isoformat()}
+
+def _serialize_query_result(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a query_result frame, sending the result's rows positionally"""
+    data = {**data, 'result': compact_query_result(data['result'])}
+    return _serialize_frame('query_result', data)
+
+# Message types whose data is built here and already JSON-ready skip the Pydantic model entirely
+_SERIALIZERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    'error': functools.partial(_serialize_frame, 'error'),
+    'room_joined': functools.partial(_serialize_frame, 'room_joined'),
+    'room_left': functools.partial(_serialize_frame, 'room_left'),
+    'query_started': functools.partial(_serialize_frame, 'query_started'),
+    'query_result': _serialize_query_result,
+    'query_result_chunk': functools.partial(_serialize_frame, 'query_result_chunk'),
+    'database_update': functools.partial(_serialize_frame, 'database_update'),
+    'nl_processing_started': functools.partial(_serialize_frame, 'nl_processing_started'),
+    'nl_query_result': functools.partial(_serialize_frame, 'nl_query_result'),
+    'nl_query_error': functools.partial(_serialize_frame, 'nl_query_error'),
+    'active_connections': functools.partial(_serialize_frame, 'active_connections'),
+}
+
+def serialize_websocket_message(message_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Serialize a message, using the type's fast path when there is one"""
+    serializer = _SERIALIZERS.get(message_type)
+    if serializer is not None:
+        return serializer(data)
+    return WebSocketMessage(type=message_type, data=data).dict()
+
+# Updates to the same database within this window go out as one digest frame
+DATABASE_UPDATE_INTERVAL = 0.01
+_update_batcher: Optional[RoomBatcher] = None  # created by init_socketio_handlers
+
+def _database_update_digest(updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge updates queued for one database into a database_update frame grouped by update type"""
+    grouped = defaultdict(list)
+    for update in updates:
+        grouped[update['update_type']].append(update['data'])
+    
+    return serialize_websocket_message("database_update", {
+        "database_id": updates[0]['database_id'],
+        "updates": dict(grouped)
+    })
+
+def _emit_message(message: Dict[str, Any]):
+    """Send a message frame to the client whose event is being handled"""
+    emit('message', message)
+
+def ws_error_handler(action: str, send: Optional[Callable[[Dict[str, Any]], None]] = _emit_message):
+    """Log a handler's exceptions and pass an error frame to send; send=None only logs"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            try:
+                return handler(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"Error {action}: {str(e)}")
+                if send is not None:
+                    send(serialize_websocket_message("error", {"error": str(e)}))
+        return wrapper
+    return decorator
 
 def init_socketio_handlers(socketio):
     """Initialize all WebSocket event handlers"""
     
+    # Query traffic is coalesced per room into 'messages' list frames
+    batcher = RoomBatcher(socketio)
+    
+    global _update_batcher
+    _update_batcher = RoomBatcher(
+        socketio, event='message', flush_interval=DATABASE_UPDATE_INTERVAL, combine=_database_update_digest
+    )
+    
     @socketio.on('connect')
+    @ws_error_handler("handling connection", send=lambda error_message: disconnect())
     def handle_connect(auth=None):
         """Handle client connection"""
-        try:
-            client_id = request.sid
-            client_info = {
-                'connected_at': datetime.utcnow().isoformat(),
-                'ip_address': request.environ.get('REMOTE_ADDR'),
-                'user_agent': request.headers.get('User-Agent'),
-                'rooms': set()
-            }
-            
+        client_id = request.sid
+        # One clock read serves the connection record and the welcome frame
+        now = datetime.utcnow()
+        now_iso = now.isoformat()
+        client_info = ConnectionInfo(
+            connected_at=now_iso,
+            ip_address=request.environ.get('REMOTE_ADDR'),
+            user_agent=request.headers.get('User-Agent')
+        )
+        
+        with _connections_lock:
             active_connections[client_id] = client_info
-            
-            logger.info(f"Client connected: {client_id}")
-            
-            # Send welcome message
-            welcome_message = WebSocketMessage(
-                type="connection",
-                data={
-                    "status": "connected",
-                    "client_id": client_id,
-                    "server_time": datetime.utcnow().isoformat()
-                },
-                timestamp=datetime.utcnow()
-            )
-            
-            emit('message', serialize_websocket_message(welcome_message))
-            
-        except Exception as e:
-            logger.error(f"Error handling connection: {str(e)}")
-            disconnect()
+            _connections_changed()
+        
+        logger.info(f"Client connected: {client_id}")
+        
+        # Send welcome message
+        welcome_message = _WELCOME_TEMPLATE.copy()
+        welcome_message['data'] = {
+            "status": "connected",
+            "client_id": client_id,
+            "server_time": now_iso
+        }
+        welcome_message['timestamp'] = now
+        
+        emit('message', welcome_message)
     
     @socketio.on('disconnect')
-    def handle_disconnect():
+    @ws_error_handler("handling disconnection", send=None)
+    def handle_disconnect(reason=None):
         """Handle client disconnection"""
-        try:
-            client_id = request.sid
-            
-            if client_id in active_connections:
-                # Leave all rooms
-                client_rooms = active_connections[client_id].get('rooms', set())
-                for room in client_rooms:
-                    leave_room(room)
-                
-                # Remove from active connections
-                del active_connections[client_id]
-                
-                logger.info(f"Client disconnected: {client_id}")
+        client_id = request.sid
+        
+        with _connections_lock:
+            client_info = active_connections.pop(client_id, None)
+            if client_info is not None:
+                _connections_changed()
+                for room in client_info.rooms:
+                    room_counts[room] -= 1
+                    if not room_counts[room]:
+                        del room_counts[room]
+        
+        if client_info is not None:
+            # Leave all rooms
+            for room in client_info.rooms:
+                leave_room(room, sid=client_id)
             
-        except Exception as e:
-            logger.error(f"Error handling disconnection: {str(e)}")
+            logger.info(f"Client disconnected: {client_id}")
     
     @socketio.on('join_database')
+    @ws_error_handler("joining database room")
     def handle_join_database(data):
         """Join a database-specific room for updates"""
-        try:
-            client_id = request.sid
-            database_id = data.get('database_id')
-            
-            if not database_id:
-                error_message = WebSocketMessage(
-                    type="error",
-                    data={"error": "Database ID is required"}
-                )
-                emit('message', serialize_websocket_message(error_message))
-                return
-            
-            # Validate database exists
-            db_info = db_model.get_database_info(database_id)
-            if not db_info:
-                error_message = WebSocketMessage(
-                    type="error",
-                    data={"error": f"Database not found: {database_id}"}
-                )
-                emit('message', serialize_websocket_message(error_message))
-                return
-            
-            room_name = f"database_{database_id}"
-            join_room(room_name)
-            
-            # Update client info
-            if client_id in active_connections:
-                active_connections[client_id]['rooms'].add(room_name)
-            
-            # Send confirmation
-            # Convert DatabaseInfo to dict with proper datetime serialization
-            db_info_dict = {
-                'id': db_info.id,
-                'path': db_info.path,
-                'tables': db_info.tables,
-                'size': db_info.size,
-                'status': db_info.status.value,
-                'created_at': db_info.created_at.isoformat() if db_info.created_at else None,
-                'last_accessed': db_info.last_accessed.isoformat() if db_info.last_accessed else None
-            }
-            
-            join_message = WebSocketMessage(
-                type="room_joined",
-                data={
-                    "room": room_name,
-                    "database_id": database_id,
-                    "database_info": db_info_dict
-                }
-            )
-            
-            emit('message', serialize_websocket_message(join_message))
-            logger.info(f"Client {client_id} joined room {room_name}")
-            
-        except Exception as e:
-            logger.error(f"Error joining database room: {str(e)}")
-            error_message = WebSocketMessage(
-                type="error",
-                data={"error": str(e)}
-            )
-            emit('message', serialize_websocket_message(error_message))
+        client_id = request.sid
+        database_id = data.get('database_id')
+        
+        if not database_id:
+            emit('message', serialize_websocket_message("error", {"error": "Database ID is required"}))
+            return
+        
+        # Validate database exists
+        db_info_dict = get_database_info_dict(database_id)
+        if not db_info_dict:
+            emit('message', serialize_websocket_message("error", {"error": f"Database not found: {database_id}"}))
+            return
+        
+        room_name = database_room(database_id)
+        # The sid bound above is passed on so the room helpers skip another request lookup
+        join_room(room_name, sid=client_id)
+        
+        # Update client info
+        _track_room_join(client_id, room_name)
+        
+        # Send confirmation
+        emit('message', serialize_websocket_message("room_joined", {
+            "room": room_name,
+            "database_id": database_id,
+            "database_info": db_info_dict
+        }))
+        # Room changes are frequent, so they log at DEBUG and skip formatting when that is off
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Client {client_id} joined room {room_name}")
     
     @socketio.on('leave_database')
+    @ws_error_handler("leaving database room")
     def handle_leave_database(data):
         """Leave a database-specific room"""
-        try:
-            client_id = request.sid
-            database_id = data.get('database_id')
-            
-            if not database_id:
-                error_message = WebSocketMessage(
-                    type="error",
-                    data={"error": "Database ID is required"}
-                )
-                emit('message', serialize_websocket_message(error_message))
-                return
-            
-            room_name = f"database_{database_id}"
-            leave_room(room_name)
-            
-            # Update client info
-            if client_id in active_connections:
-                active_connections[client_id]['rooms'].discard(room_name)
-            
-            # Send confirmation
-            leave_message = WebSocketMessage(
-                type="room_left",
-                data={
-                    "room": room_name,
-                    "database_id": database_id
-                }
-            )
-            
-            emit('message', serialize_websocket_message(leave_message))
-            logger.info(f"Client {client_id} left room {room_name}")
+        client_id = request.sid
+        database_id = data.get('database_id')
+        
+        if not database_id:
+            emit('message', serialize_websocket_message("error", {"error": "Database ID is required"}))
+            return
+        
+        room_name = database_room(database_id)
+        leave_room(room_name, sid=client_id)
+        
+        # Update client info
+        _track_room_leave(client_id, room_name)
+        
+        # Send confirmation
+        emit('message', serialize_websocket_message("room_left", {
+            "room": room_name,
+            "database_id": database_id
+        }))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Client {client_id} left room {room_name}")
+    
+    def send_chunked_query_result(database_id: str, query: str, room_name: str):
+        """Send a SELECT's rows to a room as query_result_chunk frames, with no client flow control; a single-chunk result is sent as query_result"""
+        start_time = time.monotonic()
+        chunks = db_model.stream_query(database_id, query)
+        chunk = next(chunks)
+        
+        if not chunk['success'] or chunk['done']:
+            result = chunk if not chunk['success'] else {
+                'success': True,
+                'data': chunk['chunk'],
+                'columns': chunk['columns'],
+                'row_count': len(chunk['chunk']),
+                'execution_time': time.monotonic() - start_time
+            }
+            batcher.enqueue(room_name, serialize_websocket_message("query_result", {
+                "database_id": database_id,
+                "query": query,
+                "result": result
+            }))
+            return
+        
+        seq = 0
+        row_count = 0
+        while True:
+            frame = {
+                "database_id": database_id,
+                "query": query,
+                "seq": seq
+            }
+            if seq == 0:
+                frame["columns"] = chunk['columns']
             
-        except Exception as e:
-            logger.error(f"Error leaving database room: {str(e)}")
-            error_message = WebSocketMessage(
-                type="error",
-                data={"error": str(e)}
-            )
-            emit('message', serialize_websocket_message(error_message))
+            if chunk['success']:
+                frame["rows"] = [list(row.values()) for row in chunk['chunk']]
+                frame["final"] = chunk['done']
+                row_count += len(frame["rows"])
+            else:
+                frame["rows"] = []
+                frame["final"] = True
+                frame["error"] = chunk['error']
+            
+            if frame["final"]:
+                frame["row_count"] = row_count
+                frame["execution_time"] = time.monotonic() - start_time
+            
+            # Sent after anything still queued, such as the start message, but without waiting for the flush window
+            batcher.emit_after_pending('message', serialize_websocket_message("query_result_chunk", frame), room_name)
+            if frame["final"]:
+                break
+            
+            # Room emits cannot take ack callbacks, so clients grant no credit; yielding between chunks
+            # only keeps pings and other clients served during a long result
+            socketio.sleep(0)
+            seq += 1
+            chunk = next(chunks)
     
+    # Errors are queued like the start message so the client never sees the error first
     @socketio.on('execute_query')
+    @ws_error_handler("executing query", send=lambda error_message: batcher.enqueue(request.sid, error_message))
     def handle_execute_query(data):
         """Execute a SQL query and broadcast results"""
+        client_id = request.sid
+        
+        # Validate required fields
+        database_id = data.get('database_id')
+        query = data.get('query')
+        
+        if not database_id or not query:
+            emit('message', serialize_websocket_message("error", {"error": "Database ID and query are required"}))
+            return
+        
+        # Send query started message
+        batcher.enqueue(client_id, serialize_websocket_message("query_started", {
+            "database_id": database_id,
+            "query": query
+        }))
+        
+        room_name = database_room(database_id)
+        
+        # SELECT rows are fetched and sent a chunk at a time instead of as one large frame
+        if is_select_query(query):
+            send_chunked_query_result(database_id, query, room_name)
+            return
+        
+        # Execute query; a write may change the database's tables or size
+        result = db_model.execute_query(database_id, query)
+        if result['success'] and 'rows_affected' in result:
+            broadcast_database_update(database_id, "query_executed", {
+                "query": query,
+                "rows_affected": result['rows_affected']
+            })
+        
+        # Broadcast results to database room
+        batcher.enqueue(room_name, serialize_websocket_message("query_result", {
+            "database_id": database_id,
+            "query": query,
+            "result": result
+        }))
+    
+    def emit_to_client(client_id: str, message_type: str, data: Dict[str, Any]):
+        """Send a message frame to one client from outside its event handler"""
+        socketio.emit('message', serialize_websocket_message(message_type, data), room=client_id)
+    
+    def run_natural_language_query(app, client_id: str, nl_request: NaturalLanguageQueryRequest):
+        """Run a natural language query on a worker thread and send the outcome to the requesting client"""
         try:
-            client_id = request.sid
-            
-            # Validate required fields
-            database_id = data.get('database_id')
-            query = data.get('query')
-            
-            if not database_id or not query:
-                error_message = WebSocketMessage(
-                    type="error",
-                    data={"error": "Database ID and query are required"}
+            # Process natural language query; the AI services read settings from the app config
+            with app.app_context():
+                result = ai_service.process_natural_language_query(
+                    prompt=nl_request.prompt,
+                    database_id=nl_request.database_id,
+                    include_explanation=nl_request.include_explanation,
+                    model=nl_request.model
                 )
-                emit('message', serialize_websocket_message(error_message))
-                return
-            
-            # Send query started message
-            start_message = WebSocketMessage(
-                type="query_started",
-                data={
-                    "database_id": database_id,
-                    "query": query
-                }
-            )
-            emit('message', serialize_websocket_message(start_message))
-            
-            # Execute query
-            result = db_model.execute_query(database_id, query)
             
             # Send results
-            result_message = WebSocketMessage(
-                type="query_result",
-                data={
-                    "database_id": database_id,
-                    "query": query,
-                    "result": result
-                }
-            )
-            
-            # Broadcast to database room
-            room_name = f"database_{database_id}"
-            socketio.emit('message', serialize_websocket_message(result_message), room=room_name)
+            if result.success:
+                emit_to_client(client_id, "nl_query_result", {
+                    "database_id": nl_request.database_id,
+                    "original_query": nl_request.prompt,
+                    "result": result.dict()
+                })
+            else:
+                emit_to_client(client_id, "nl_query_error", {
+                    "database_id": nl_request.database_id,
+                    "query": nl_request.prompt,
+                    "error": result.error
+                })
             
         except Exception as e:
-            logger.error(f"Error executing query: {str(e)}")
-            error_message = WebSocketMessage(
-                type="error",
-                data={"error": str(e)}
-            )
-            emit('message', serialize_websocket_message(error_message))
+            logger.error(f"Error processing natural language query: {str(e)}")
+            emit_to_client(client_id, "error", {"error": str(e)})
     
     @socketio.on('natural_language_query')
+    @ws_error_handler("processing natural language query")
     def handle_natural_language_query(data):
         """Process natural language query and return SQL"""
+        client_id = request.sid
+        
+        # Validate request data; the validated request needs no further model round-trip for output
         try:
-            client_id = request.sid
-            
-            # Validate request data
-            try:
-                nl_request = NaturalLanguageQueryRequest(**data)
-            except ValidationError as e:
-                error_message = WebSocketMessage(
-                    type="error",
-                    data={"error": "Invalid request data", "details": e.errors()},
+            nl_request = NaturalLanguageQueryRequest(**data)
+        except ValidationError as e:
+            emit('message', serialize_websocket_message("error", {
+                "error": "Invalid request data",
+                "details": e.errors()
+            }))
+            return
+        
+        # Send processing started message
+        emit('message', serialize_websocket_message("nl_processing_started", {
+            "database_id": nl_request.database_id,
+            "query": nl_request.prompt
+        }))
+        
+        # The LLM round-trip runs on the worker pool so this handler returns right away
+        nl_query_executor.submit(
+            run_natural_language_query, current_app._get_current_object(), client_id, nl_request
+        )
     
-                )
-                emit('message', error_message.dict())
-                return
-            
-            # Send processing started message
-            start_message = WebSocketMessage(
-                type="nl_processing_started",
+    @socketio.on('get_database_status')
+    @ws_error_handler("getting database status")
+    def handle_get_database_status(data):
+        """Get current status of a database"""
+        database_id = data.get('database_id')
+        
+        if not database_id:
+            emit('message', serialize_websocket_message("error", {"error": "Database ID is required"}))
+            return
+        
+        # Get database info
+        db_info_dict = get_database_info_dict(database_id)
+        
+        if db_info_dict:
+            status_message = WebSocketMessage(
+                type="database_status",
                 data={
-                    "database_id": nl_request.database_id,
-                    "query": nl_request.query
+                    "database_id": database_id,
+                    "status": DatabaseStatus.CONNECTED.value,
+                    "info": db_info_dict
                 },
 
             )
-            emit('message', start_message.dict())
-            
-            # Process natural language query
-            result = ai_service.process_natural_language_query(
-                prompt=nl_request.query,
-                database_id=nl_request.database_id,
-                include_explanation=True
-            )
-            
-            # Send results
-            if result['success']:
-                success_message = WebSocketMessage(
-                    type="nl_query_result",
-                    data={
-                        "database_id": nl_request.database_id,
-                        "original_query": nl_request.query,
-                        "result": result
-                    },
-    
-                )
-                emit('message', success_message.dict())
-                
-            else:
-                error_message = WebSocketMessage(
-                    type="nl_query_error",
-                    data={
-                        "database_id": nl_request.database_id,
-                        "query": nl_request.query,
-                        "error": result.get('error')
-                    },
-    
-                )
-                emit('message', error_message.dict())
-            
-        except Exception as e:
-            logger.error(f"Error processing natural language query: {str(e)}")
-            error_message = WebSocketMessage(
-                type="error",
-                data={"error": str(e)},
-
-            )
-            emit('message', error_message.dict())
-    
-    @socketio.on('get_database_status')
-    def handle_get_database_status(data):
-        """Get current status of a database"""
-        try:
-            database_id = data.get('database_id')
-            
-            if not database_id:
-                error_message = WebSocketMessage(
-                    type="error",
-                    data={"error": "Database ID is required"},
-    
-                )
-                emit('message', error_message.dict())
-                return
-            
-            # Get database info
-            db_info = db_model.get_database_info(database_id)
-            
-            if db_info:
-                status_message = WebSocketMessage(
-                    type="database_status",
-                    data={
-                        "database_id": database_id,
-                        "status": DatabaseStatus.CONNECTED.value,
-                        "info": db_info
-                    },
-    
-                )
-            else:
-                status_message = WebSocketMessage(
-                    type="database_status",
-                    data={
-                        "database_id": database_id,
-                        "status": DatabaseStatus.NOT_FOUND.value
-                    },
-    
-                )
-            
-            emit('message', status_message.dict())
-            
-        except Exception as e:
-            logger.error(f"Error getting database status: {str(e)}")
-            error_message = WebSocketMessage(
-                type="error",
-                data={"error": str(e)},
+        else:
+            status_message = WebSocketMessage(
+                type="database_status",
+                data={
+                    "database_id": database_id,
+                    "status": "not_found"
+                },
 
             )
-            emit('message', error_message.dict())
+        
+        emit('message', status_message.dict())
     
     @socketio.on('ping')
+    @ws_error_handler("handling ping", send=None)
     def handle_ping(data):
         """Handle ping requests for connection health check"""
-        try:
-            pong_message = WebSocketMessage(
-                type="pong",
-                data={
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "client_id": request.sid
-                },
-
-            )
-            emit('message', pong_message.dict())
-            
-        except Exception as e:
-            logger.error(f"Error handling ping: {str(e)}")
+        pong_message = _PONG_TEMPLATE.copy()
+        pong_message['data'] = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "client_id": request.sid
+        }
+        pong_message['timestamp'] = datetime.now()
+        emit('message', pong_message)
     
     @socketio.on('get_active_connections')
+    @ws_error_handler("getting active connections")
     def handle_get_active_connections(data):
         """Get information about active connections (admin only)"""
-        try:
-            # In a real application, you would check admin permissions here
-            
-            connections_info = {
-                'total_connections': len(active_connections),
-                'connections': [
-                    {
-                        'client_id': client_id,
-                        'connected_at': info['connected_at'],
-                        'rooms': list(info['rooms'])
-                    }
-                    for client_id, info in active_connections.items()
-                ]
-            }
-            
-            status_message = WebSocketMessage(
-                type="active_connections",
-                data=connections_info,
-
-            )
-            
-            emit('message', status_message.dict())
-            
-        except Exception as e:
-            logger.error(f"Error getting active connections: {str(e)}")
-            error_message = WebSocketMessage(
-                type="error",
-                data={"error": str(e)},
-
-            )
-            emit('message', error_message.dict())
+        # In a real application, you would check admin permissions here
+        
+        emit('message', serialize_websocket_message("active_connections", get_active_connections_info()))
 
 def broadcast_database_update(database_id: str, update_type: str, data: Dict[str, Any]):
     """Broadcast database updates to all clients in the database room"""
     try:
-        from app import socketio  # Import here to avoid circular imports
+        room_name = database_room(database_id)
+        invalidate_database_info(database_id)
+        if _update_batcher is None:
+            return  # Socket.IO handlers not initialized, so there are no clients to notify
         
-        room_name = f"database_{database_id}"
-        
-        update_message = WebSocketMessage(
-            type="database_update",
-            data={
-                "database_id": database_id,
-                "update_type": update_type,
-                "data": data
-            }
-        )
-        
-        socketio.emit('message', update_message.dict(), room=room_name)
-        logger.info(f"Broadcasted {update_type} update to room {room_name}")
+        # Sent with any other updates to the room in the same window as one digest frame
+        _update_batcher.enqueue(room_name, {
+            "database_id": database_id,
+            "update_type": update_type,
+            "data": data
+        })
+        logger.info(f"Queued {update_type} update for room {room_name}")
         
     except Exception as e:
         logger.error(f"Error broadcasting database update: {str(e)}")
@@ -452,14 +583,12 @@ def broadcast_system_message(message_type: str, data: Dict[str, Any]):
         logger.error(f"Error broadcasting system message: {str(e)}")
 
 def get_connection_stats() -> Dict[str, Any]:
-    """Get statistics about active connections"""
+    """Get statistics about the active connections of this worker process only"""
     try:
-        total_connections = len(active_connections)
-        rooms_count = {}
-        
-        for client_info in active_connections.values():
-            for room in client_info.get('rooms', set()):
-                rooms_count[room] = rooms_count.get(room, 0) + 1
+        # Room membership is counted as clients join and leave, so no walk over all connections
+        with _connections_lock:
+            total_connections = len(active_connections)
+            rooms_count = dict(room_counts)
         
         return {
             'total_connections': total_connections,
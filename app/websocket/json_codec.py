@@ -0,0 +1,14 @@
+# orjson-backed stand-in for the json module, passed to SocketIO(json=...)
+import orjson
+from typing import Any
+
+# Datetimes serialize natively; int keys are stringified as the stdlib json module does
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def dumps(obj: Any, *args, **kwargs) -> str:
+    """Serialize to a JSON string; the separators/indent arguments Socket.IO passes are ignored"""
+    return orjson.dumps(obj, default=str, option=_OPTIONS).decode()
+
+def loads(s: Any, *args, **kwargs) -> Any:
+    """Parse a JSON string or bytes"""
+    return orjson.loads(s)
\ No newline at end of file
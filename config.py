@@ -5,13 +5,23 @@ load_dotenv()
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    OPENROUTER_API_KEY = os.environ.get('OPENROUTER_API_KEY')
+    # Optional comma-separated list of keys; requests are spread across them round-robin
+    OPENROUTER_API_KEYS = [key.strip() for key in os.environ.get('OPENROUTER_API_KEYS', '').split(',') if key.strip()]
+    OPENROUTER_API_KEY = os.environ.get('OPENROUTER_API_KEY') or next(iter(OPENROUTER_API_KEYS), None)
     OPENROUTER_MODEL = "google/gemini-2.5-flash-preview-05-20"
     OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+    OPENROUTER_MAX_CONCURRENCY = int(os.environ.get('OPENROUTER_MAX_CONCURRENCY', 10))
+    OPENROUTER_REQUESTS_PER_MINUTE = int(os.environ.get('OPENROUTER_REQUESTS_PER_MINUTE', 120))
     
     # Database settings
     MAX_DATABASE_SIZE = 100 * 1024 * 1024  # 100MB
-    ALLOWED_EXTENSIONS = {'.db', '.sqlite', '.sqlite3'}
+    ALLOWED_EXTENSIONS = frozenset(('.db', '.sqlite', '.sqlite3'))
+    
+    # WebSocket settings
+    # Optional pub/sub URL (e.g. redis://localhost:6379/0) so broadcasts reach clients on every worker
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+    # Frames on the long-polling transport at least this large are gzip/deflate compressed
+    SOCKETIO_COMPRESSION_THRESHOLD = int(os.environ.get('SOCKETIO_COMPRESSION_THRESHOLD', 1024))
     
     # Rate limiting
     RATELIMIT_STORAGE_URL = "memory://"
@@ -236,6 +236,11 @@ class SQLiteAIManager {
                 this.handleWebSocketMessage(data);
             });
             
+            // Batched frames carry a list of messages queued for the same room
+            this.socket.on('messages', (batch) => {
+                batch.forEach((data) => this.handleWebSocketMessage(data));
+            });
+            
         } catch (error) {
             console.error('Failed to initialize WebSocket:', error);
             this.updateConnectionStatus('error');
@@ -1315,11 +1320,20 @@ class SQLiteAIManager {
                 console.log('Connection confirmed:', data.data);
                 break;
             case 'query_result':
-                // Handle real-time query results if needed
+                // Handle real-time query results if needed; rows arrive as arrays
+                // in data.data.result.rows, ordered like data.data.result.columns
+                break;
+            case 'query_result_chunk':
+                // Results larger than one chunk arrive as numbered frames: the first
+                // carries data.data.columns, each carries rows, the last has final set
                 break;
             case 'database_update':
-                // Handle database updates
+                // Handle database updates; data.data.updates groups the payloads of
+                // every update in the window by update type
                 this.loadDatabases();
+                if (data.data.database_id === this.currentDatabase) {
+                    this.loadTables(this.currentDatabase);
+                }
                 break;
             case 'error':
                 this.showToast(data.data.error, 'error');
@@ -83,6 +83,12 @@ class WebSocketClient {
         this.socket.on('status_update', (data) => this.handleStatusUpdate(data));
         this.socket.on('pong', (data) => this.handlePong(data));
         this.socket.on('connection_info', (data) => this.handleConnectionInfo(data));
+        
+        // Server frames arrive singly on 'message', or batched per room as a list on 'messages'
+        this.socket.on('message', (data) => this.handleMessage(data));
+        this.socket.on('messages', (batch) => {
+            batch.forEach((data) => this.handleMessage(data));
+        });
     }
     
     // Connection event handlers
@@ -138,6 +144,11 @@ class WebSocketClient {
     }
     
     // Message handlers
+    handleMessage(data) {
+        // Dispatch each frame to listeners registered for its type
+        this.emit(data.type, data);
+    }
+    
     handleQueryResult(data) {
         console.log('Query result received:', data);
         this.emit('query_result', data);
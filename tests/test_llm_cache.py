@@ -0,0 +1,39 @@
+import unittest
+
+from app.services.llm_cache import SemanticCache
+
+class SemanticCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticCache(threshold=0.92)
+
+    def test_rejects_reversed_sort_order(self):
+        self.cache.set("p", "list all albums ordered by title ascending", "SELECT * FROM Album ORDER BY Title ASC")
+
+        self.assertIsNone(self.cache.get("p", "list all albums ordered by title descending"))
+
+    def test_rejects_negated_condition(self):
+        self.cache.set("p", "how many tracks are longer than 5 minutes", "SELECT COUNT(*) FROM Track WHERE Milliseconds > 300000")
+
+        self.assertIsNone(self.cache.get("p", "how many tracks are not longer than 5 minutes"))
+
+    def test_rejects_different_numbers_and_operators(self):
+        self.cache.set("p", "show tracks where milliseconds > 300000", "SELECT * FROM Track WHERE Milliseconds > 300000")
+
+        self.assertIsNone(self.cache.get("p", "show tracks where milliseconds < 300000"))
+        self.assertIsNone(self.cache.get("p", "show tracks where milliseconds > 200000"))
+
+    def test_rejects_swapped_entity_in_long_prompt(self):
+        prompt = ("show me the first name last name email and phone number of every customer "
+                  "who lives in the city of {} and has placed at least one invoice this year")
+        self.cache.set("p", prompt.format("Paris"), "SELECT * FROM Customer WHERE City = 'Paris'")
+
+        self.assertIsNone(self.cache.get("p", prompt.format("Berlin")))
+
+    def test_serves_prompt_differing_only_in_filler_words(self):
+        self.cache.set("p", "show me all tracks that are longer than 5 minutes in the rock genre", "SELECT 1")
+
+        self.assertEqual(self.cache.get("p", "Show me all tracks that are longer than 5 minutes in the Rock genre?"), "SELECT 1")
+        self.assertEqual(self.cache.get("p", "show all tracks that are longer than 5 minutes in the rock genre"), "SELECT 1")
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file